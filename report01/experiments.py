@@ -10,21 +10,91 @@
 5. レポート用の包括的な結果出力
 """
 
+import argparse
 import glob
 import json
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import cv2
 import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
+from matplotlib.figure import Figure
+
+from utils import profiling
+from utils.calibration_store import CalibrationStore
+from utils.calibrate import find_corners_pyramid, refine_calibration, reject_outlier_views, reprojection_errors
+from utils.corner_cache import CornerCache
+from utils.undistort import Undistorter
+from utils.view_selection import select_views
 
 # 日本語フォント設定
 plt.rcParams['font.size'] = 12
 sns.set_style("whitegrid")
 
+# コーナー検出の設定
+CORNER_DETECTION_FLAGS = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_FAST_CHECK + cv2.CALIB_CB_NORMALIZE_IMAGE
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+SUBPIX_WINDOW = (11, 11)
+
+
+def detect_corners_in_file(image_file, checkerboard_size, flags=CORNER_DETECTION_FLAGS,
+                           criteria=SUBPIX_CRITERIA, win_size=SUBPIX_WINDOW,
+                           detection_mode="full", pyramid_max_dim=1024):
+    """
+    1枚の画像からコーナーを検出（プロセスプールのワーカーとしても使用）
+    
+    detection_mode:
+    "full" - 原寸画像でfindChessboardCornersを実行
+    "pyramid" - 縮小画像で探索し、原寸でcornerSubPixにより改良（高解像度向け）
+    
+    Returns:
+    dict: image_file, image_size (width, height), corners (未検出ならNone), error
+    """
+    result = {'image_file': image_file, 'image_size': None, 'corners': None, 'error': None}
+    try:
+        with profiling.span("imread", file=Path(image_file).name):
+            img = cv2.imread(image_file)
+        if img is None:
+            result['error'] = "Could not load"
+            return result
+        result['image_size'] = img.shape[:2][::-1]  # (width, height)
+        
+        with profiling.span("cvtColor"):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if detection_mode == "pyramid":
+            with profiling.span("find_corners_pyramid"):
+                _, result['corners'] = find_corners_pyramid(gray, checkerboard_size, flags, criteria,
+                                                            win_size, pyramid_max_dim)
+            return result
+        
+        with profiling.span("find_corners"):
+            ret, corners = cv2.findChessboardCorners(gray, checkerboard_size, flags)
+        if ret:
+            # サブピクセル精度でコーナーを改良
+            with profiling.span("corner_subpix"):
+                result['corners'] = cv2.cornerSubPix(gray, corners, win_size, (-1, -1), criteria)
+    except Exception as e:
+        # 1枚の失敗でバッチ全体を止めない
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _init_detection_worker(trace_path=None, trace_memory=False):
+    """ワーカープロセス内でOpenCVのスレッド数を制限（trace_path指定時は計測区間を記録し終了時に保存）"""
+    cv2.setNumThreads(1)
+    if trace_path:
+        profiling.enable(memory=trace_memory)
+        multiprocessing.util.Finalize(None, profiling.save_part, args=(trace_path,), exitpriority=5)
+
+
 class PerfectOpenCVCalibration:
-    def __init__(self, checkerboard_size=(7, 7), square_size=20.0, output_dir="calibration_results"):
+    def __init__(self, checkerboard_size=(7, 7), square_size=20.0, output_dir="calibration_results",
+                 n_workers=1, use_cache=True, cache_dir=None, detection_mode="full", pyramid_max_dim=1024,
+                 trace_path=None, trace_memory=False, headless=False, plots=None, plot_dpi=300, max_views=None,
+                 target_rms=None, max_drop=None, min_views=10):
         """
         完璧なOpenCVカメラ校正クラス
         
@@ -32,12 +102,52 @@ class PerfectOpenCVCalibration:
         checkerboard_size: (cols, rows) 内部コーナー数
         square_size: 正方形のサイズ（mm）
         output_dir: 結果保存ディレクトリ
+        n_workers: コーナー検出の並列プロセス数（1なら逐次処理）
+        use_cache: コーナー検出結果のディスクキャッシュを使うか
+        cache_dir: キャッシュディレクトリ（既定: output_dir/corner_cache）
+        detection_mode: "full"（原寸で検出）または "pyramid"（縮小画像で探索→原寸で改良）
+        pyramid_max_dim: pyramidモードで探索に使う縮小画像の長辺（px）
+        trace_path: 指定すると各処理段階の時間を計測し、run_complete_calibration()の最後に
+                    Chrome trace形式（Perfettoで表示可能）で保存
+        trace_memory: tracemallocでピークメモリも記録するか
+        headless: Trueなら確認入力・plt.show()などGUI呼び出しを一切行わない（バッチジョブ用）
+        plots: "show"（描画して表示）、"background"（Aggでバックグラウンド保存）、"skip"（図を作らない）
+               既定はheadlessなら"background"、それ以外は"show"
+        plot_dpi: 保存する図の解像度
+        max_views: 校正に使うビュー数の上限（Noneなら全ビュー、select_views()参照）
+        target_rms, max_drop, min_views: 校正後の外れ値ビュー除外の設定（reject_outliers()参照）。
+                                         target_rmsかmax_dropを指定したときだけ実行する。
+                                         max_dropがNoneなら除外数の上限なし（min_viewsまで）、負の値も上限なし
         """
         self.checkerboard_size = checkerboard_size
         self.square_size = square_size
+        self.n_workers = n_workers
+        self.max_views = max_views
+        self.view_selection = None
+        self.outlier_settings = {'target_rms': target_rms, 'max_drop': max_drop, 'min_views': min_views}
+        self.detection_mode = detection_mode
+        self.pyramid_max_dim = pyramid_max_dim
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
+        # 図の出力（headlessではGUIを使わずAggで描画）
+        self.headless = headless
+        self.plots = plots or ("background" if headless else "show")
+        if self.plots not in ("show", "background", "skip"):
+            raise ValueError(f"Unknown plots mode: {self.plots}")
+        self.plot_dpi = plot_dpi
+        self._plot_executor = None
+        self._plot_jobs = []
+        
+        # 処理段階ごとの計測
+        self.trace_path = trace_path
+        if trace_path:
+            profiling.enable(memory=trace_memory)
+        
+        # コーナー検出キャッシュ
+        self.use_cache = use_cache
+        self.corner_cache = CornerCache(cache_dir or self.output_dir / 'corner_cache') if use_cache else None
+        
         # 3D座標の準備
         self.objp = np.zeros((checkerboard_size[0] * checkerboard_size[1], 3), np.float32)
         self.objp[:, :2] = np.mgrid[0:checkerboard_size[0], 
@@ -68,42 +178,36 @@ class PerfectOpenCVCalibration:
         print(f"Found {len(image_files)} images in {image_dir}")
         return sorted(image_files)
     
-    def process_images(self, image_files, show_progress=True):
-        """複数画像のコーナー検出処理"""
+    def process_images(self, image_files, show_progress=True, n_workers=None):
+        """
+        複数画像のコーナー検出処理
+        
+        n_workers > 1 の場合はプロセスプールで並列に検出する。
+        キャッシュ済みの画像は検出を省略し、新規・変更された画像のみ処理する。
+        結果は常にファイル順に取り込まれる。
+        """
+        n_workers = self.n_workers if n_workers is None else n_workers
         successful_detections = 0
         failed_detections = 0
         
         print(f"Processing {len(image_files)} images...")
         
-        for i, image_file in enumerate(image_files):
+        for i, result in enumerate(self._detect_all(image_files, n_workers)):
             if show_progress and (i + 1) % 5 == 0:
                 print(f"Progress: {i + 1}/{len(image_files)} images processed")
             
-            # 画像読み込み
-            img = cv2.imread(image_file)
-            if img is None:
-                print(f"✗ Could not load {Path(image_file).name}")
+            image_file = result['image_file']
+            if result['error'] is not None:
+                print(f"✗ {result['error']}: {Path(image_file).name}")
                 failed_detections += 1
                 continue
             
             # 画像サイズを記録（初回のみ）
             if self.image_size is None:
-                self.image_size = img.shape[:2][::-1]  # (width, height)
-            
-            # グレースケール変換
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # コーナー検出
-            ret, corners = cv2.findChessboardCorners(
-                gray, self.checkerboard_size,
-                cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_FAST_CHECK + cv2.CALIB_CB_NORMALIZE_IMAGE
-            )
+                self.image_size = result['image_size']
             
-            if ret:
-                # サブピクセル精度でコーナーを改良
-                criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
-                corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
-                
+            corners = result['corners']
+            if corners is not None:
                 # データを保存
                 self.object_points.append(self.objp)
                 self.image_points.append(corners)
@@ -118,10 +222,97 @@ class PerfectOpenCVCalibration:
         print("\nCorner Detection Summary:")
         print(f"✓ Successful: {successful_detections}")
         print(f"✗ Failed: {failed_detections}")
-        print(f"Success rate: {successful_detections/(successful_detections+failed_detections)*100:.1f}%")
+        print(f"Success rate: {successful_detections/max(successful_detections+failed_detections, 1)*100:.1f}%")
         
         return successful_detections > 0
     
+    def _detection_settings(self):
+        """キャッシュキーに含める検出設定"""
+        return {
+            'checkerboard_size': list(self.checkerboard_size),
+            'flags': int(CORNER_DETECTION_FLAGS),
+            'criteria': list(SUBPIX_CRITERIA),
+            'win_size': list(SUBPIX_WINDOW),
+            'detection_mode': self.detection_mode,
+            'pyramid_max_dim': self.pyramid_max_dim if self.detection_mode == "pyramid" else None,
+        }
+    
+    def _detect_all(self, image_files, n_workers):
+        """コーナー検出結果をファイル順に返すジェネレータ（キャッシュ優先）"""
+        image_files = [str(f) for f in image_files]
+        
+        if self.corner_cache is not None:
+            settings = self._detection_settings()
+            keys = [CornerCache.make_key(f, **settings) for f in image_files]
+            cached = [self.corner_cache.get(k) if k else None for k in keys]
+        else:
+            keys = [None] * len(image_files)
+            cached = [None] * len(image_files)
+        
+        pending = [f for f, c in zip(image_files, cached) if c is None]
+        if self.corner_cache is not None:
+            print(f"Corner cache: {len(image_files) - len(pending)} hits, {len(pending)} to process")
+        detected = self._run_detection(pending, n_workers)
+        
+        for image_file, key, entry in zip(image_files, keys, cached):
+            if entry is not None:
+                yield {'image_file': image_file, 'error': None, **entry}
+                continue
+            
+            result = next(detected)
+            if key is not None and result['error'] is None:
+                self.corner_cache.put(key, result['image_size'], result['corners'])
+            yield result
+    
+    def _run_detection(self, image_files, n_workers):
+        """コーナー検出をファイル順に返すジェネレータ"""
+        options = {'detection_mode': self.detection_mode, 'pyramid_max_dim': self.pyramid_max_dim}
+        if n_workers <= 1 or len(image_files) <= 1:
+            for image_file in image_files:
+                yield detect_corners_in_file(image_file, self.checkerboard_size, **options)
+            return
+        
+        print(f"Using {n_workers} worker processes")
+        trace_args = (str(self.trace_path), profiling.is_tracing_memory()) if self.trace_path else ()
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_detection_worker,
+                                 initargs=trace_args) as executor:
+            futures = [executor.submit(detect_corners_in_file, f, self.checkerboard_size, **options)
+                       for f in image_files]
+            for image_file, future in zip(image_files, futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # ワーカープロセス自体の異常終了など
+                    yield {'image_file': image_file, 'image_size': None, 'corners': None,
+                           'error': f"{type(e).__name__}: {e}"}
+    
+    def select_views(self, max_views=None):
+        """
+        校正に使うビューを絞り込む（process_imagesとcalibrate_cameraの間で実行）
+        
+        検出済みコーナーからボードの位置・大きさ・傾きと画像上の被覆を求め、
+        ほぼ同じ姿勢のビューを除きつつ、被覆と姿勢の多様性が大きいmax_views枚を選ぶ。
+        
+        Returns:
+        dict: ビュー数と被覆率（画像を格子に分けたときにボードが覆うセルの割合）
+        """
+        max_views = self.max_views if max_views is None else max_views
+        if max_views is None or len(self.image_points) <= max_views:
+            return None
+        
+        with profiling.span("select_views", views=len(self.image_points)):
+            indices, report = select_views(self.image_points, self.image_size, self.checkerboard_size, max_views)
+        self.object_points = [self.object_points[i] for i in indices]
+        self.image_points = [self.image_points[i] for i in indices]
+        self.image_files = [self.image_files[i] for i in indices]
+        self.view_selection = report
+        
+        print(f"\nView selection: {report['views_selected']}/{report['views_total']} views "
+              f"({report['duplicates_dropped']} near-duplicates dropped)")
+        print(f"Coverage: {report['coverage_selected']*100:.1f}% of image "
+              f"(all views: {report['coverage_all']*100:.1f}%)")
+        return report
+    
     def calibrate_camera(self):
         """OpenCVによるカメラ校正"""
         if len(self.object_points) < 3:
@@ -132,16 +323,123 @@ class PerfectOpenCVCalibration:
         print("Using OpenCV's cv2.calibrateCamera()...")
         
         # OpenCVカメラ校正実行
-        self.rms_error, self.camera_matrix, self.dist_coeffs, self.rvecs, self.tvecs = cv2.calibrateCamera(
-            self.object_points, self.image_points, self.image_size, None, None,
-            flags=cv2.CALIB_RATIONAL_MODEL  # 高次歪みモデルを使用
-        )
+        with profiling.span("calibrate", views=len(self.object_points)):
+            self.rms_error, self.camera_matrix, self.dist_coeffs, self.rvecs, self.tvecs = cv2.calibrateCamera(
+                self.object_points, self.image_points, self.image_size, None, None,
+                flags=cv2.CALIB_RATIONAL_MODEL  # 高次歪みモデルを使用
+            )
         
         print("✓ Calibration successful!")
         print(f"RMS reprojection error: {self.rms_error:.4f} pixels")
         
         return True
     
+    def reprojection_errors(self):
+        """全ビューの再投影誤差（residuals, corner_errors, view_rms, rms）を一括計算"""
+        if self.camera_matrix is None:
+            print("Error: Camera not calibrated yet")
+            return None
+        return reprojection_errors(self.object_points, self.image_points, self.rvecs, self.tvecs,
+                                   self.camera_matrix, self.dist_coeffs)
+    
+    def reject_outliers(self, target_rms=None, min_views=10, max_drop=None, drop_fraction=0.1):
+        """
+        再投影誤差の大きいビューを除いて再校正を繰り返す
+        
+        target_rms（px）以下になるか、残りがmin_views枚になるか、
+        除外数がmax_dropに達したら終了する（max_dropがNoneまたは負なら上限なし）。
+        
+        Returns:
+        list: 除外した画像ファイル
+        """
+        if self.camera_matrix is None:
+            print("Error: Camera not calibrated yet")
+            return []
+        
+        if max_drop is not None and max_drop < 0:
+            max_drop = None
+        with profiling.span("reject_outliers", views=len(self.object_points)):
+            kept, solution, history = reject_outlier_views(
+                self.object_points, self.image_points, self.image_size, self.camera_matrix, self.dist_coeffs,
+                self.rvecs, self.tvecs, target_rms=target_rms, min_views=min_views, max_drop=max_drop,
+                drop_fraction=drop_fraction
+            )
+        kept_set = set(kept)
+        rejected = [f for i, f in enumerate(self.image_files) if i not in kept_set]
+        self.object_points = [self.object_points[i] for i in kept]
+        self.image_points = [self.image_points[i] for i in kept]
+        self.image_files = [self.image_files[i] for i in kept]
+        self.rms_error, self.camera_matrix, self.dist_coeffs, self.rvecs, self.tvecs = solution
+        
+        for step in history[1:]:
+            print(f"  dropped {len(step['dropped'])} views -> {step['views']} views, RMS {step['rms']:.4f} px")
+        print(f"✓ Outlier rejection: {len(rejected)} views removed, RMS {history[0]['rms']:.4f} -> "
+              f"{self.rms_error:.4f} pixels")
+        return rejected
+    
+    def add_images(self, image_files, show_progress=False, n_workers=None):
+        """
+        校正済みの状態に画像を追加（コーナー検出のみ、再校正はrefine()で実行）
+        
+        既に取り込み済みのファイルは無視する。校正済みの場合、追加ビューの姿勢は
+        現在の内部パラメータからsolvePnPで求めてrvecs/tvecsに追記し、追加ビューの
+        再投影誤差を表示する（現在の校正が新しいビューに合っているか、refine()前に確認できる）。
+        refine()は姿勢も推定し直すため、ここで求めた姿勢はrefine()までの間だけ使われる。
+        
+        Returns:
+        int: 追加されたビュー数
+        """
+        known_files = set(self.image_files)
+        new_files = [str(f) for f in image_files if str(f) not in known_files]
+        if not new_files:
+            return 0
+        
+        n_before = len(self.image_points)
+        self.process_images(new_files, show_progress=show_progress, n_workers=n_workers)
+        
+        # 既存ビューの外部パラメータは保持し、新規ビューのみ姿勢推定
+        if self.camera_matrix is not None and self.rvecs is not None:
+            rvecs, tvecs = list(self.rvecs), list(self.tvecs)
+            for objp, corners in zip(self.object_points[n_before:], self.image_points[n_before:]):
+                _, rvec, tvec = cv2.solvePnP(objp, corners, self.camera_matrix, self.dist_coeffs)
+                rvecs.append(rvec)
+                tvecs.append(tvec)
+            self.rvecs, self.tvecs = tuple(rvecs), tuple(tvecs)
+            
+            if len(self.image_points) > n_before:
+                errors = reprojection_errors(self.object_points[n_before:], self.image_points[n_before:],
+                                             self.rvecs[n_before:], self.tvecs[n_before:],
+                                             self.camera_matrix, self.dist_coeffs)
+                for image_file, view_rms in zip(self.image_files[n_before:], errors['view_rms']):
+                    print(f"  {Path(image_file).name}: {view_rms:.4f} px with current intrinsics")
+                print(f"New views RMS (before refine): {errors['rms']:.4f} pixels "
+                      f"(current calibration: {self.rms_error:.4f})")
+        
+        return len(self.image_points) - n_before
+    
+    def refine(self, max_iter=10):
+        """
+        現在のcamera_matrix/dist_coeffsを初期値とした再校正（CALIB_USE_INTRINSIC_GUESS）
+        
+        未校正の場合は通常のcalibrate_camera()を実行する。
+        """
+        if self.camera_matrix is None:
+            return self.calibrate_camera()
+        
+        if len(self.object_points) < 3:
+            print("Error: Need at least 3 images for calibration")
+            return False
+        
+        print(f"\nRefining calibration with {len(self.object_points)} images (warm start)...")
+        with profiling.span("refine", views=len(self.object_points)):
+            self.rms_error, self.camera_matrix, self.dist_coeffs, self.rvecs, self.tvecs = refine_calibration(
+                self.object_points, self.image_points, self.image_size,
+                self.camera_matrix, self.dist_coeffs, max_iter=max_iter
+            )
+        
+        print(f"✓ RMS reprojection error: {self.rms_error:.4f} pixels")
+        return True
+    
     def analyze_calibration_results(self):
         """校正結果の詳細分析"""
         if self.camera_matrix is None:
@@ -163,6 +461,14 @@ class PerfectOpenCVCalibration:
         print(f"  Aspect ratio: {fy/fx:.6f}")
         print(f"  Image size: {self.image_size[0]}×{self.image_size[1]}")
         
+        # ビューごとの再投影誤差（上位5枚）
+        errors = self.reprojection_errors()
+        worst = np.argsort(errors['view_rms'])[::-1][:5]
+        print("\nWorst views (RMS reprojection error):")
+        for i in worst:
+            name = Path(self.image_files[i]).name if i < len(self.image_files) else f"view {i}"
+            print(f"  {name}: {errors['view_rms'][i]:.4f} px (max corner {errors['corner_errors'][i].max():.4f} px)")
+        
         # 歪み係数の分析
         dist_coeffs = self.dist_coeffs.flatten()
         print("\nDistortion Coefficients:")
@@ -207,7 +513,8 @@ class PerfectOpenCVCalibration:
             'fx': fx, 'fy': fy, 'cx': cx, 'cy': cy,
             'aspect_ratio': fy/fx,
             'image_size': self.image_size,
-            'num_images': len(self.object_points)
+            'num_images': len(self.object_points),
+            'view_rms': errors['view_rms']
         }
     
     def visualize_results(self):
@@ -216,7 +523,11 @@ class PerfectOpenCVCalibration:
             print("Error: Camera not calibrated yet")
             return
         
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
+        if self.plots == "skip":
+            return
+        
+        fig = self._new_figure(figsize=(15, 12))
+        ((ax1, ax2), (ax3, ax4)) = fig.subplots(2, 2)
         
         # 1. カメラパラメータ
         params = ['fx', 'fy', 'cx', 'cy']
@@ -272,9 +583,15 @@ class PerfectOpenCVCalibration:
                startangle=90)
         ax4.set_title(f'Image Usage (Total: {total_images})')
         
-        plt.tight_layout()
-        plt.savefig(str(self.output_dir / 'opencv_calibration_analysis.png'), dpi=300, bbox_inches='tight')
-        plt.show()
+        self._output_figure(fig, 'opencv_calibration_analysis.png')
+    
+    def get_undistorter(self, image_size=None, alpha=1.0, cache_dir=None):
+        """現在の校正結果から歪み補正器（remapテーブル）を作成"""
+        if self.camera_matrix is None:
+            print("Error: Camera not calibrated yet")
+            return None
+        return Undistorter(self.camera_matrix, self.dist_coeffs, image_size or self.image_size,
+                           alpha=alpha, cache_dir=cache_dir)
     
     def demonstrate_undistortion(self, image_index=0):
         """歪み補正のデモンストレーション"""
@@ -291,7 +608,8 @@ class PerfectOpenCVCalibration:
         
         # 元画像を読み込み
         img_path = self.image_files[image_index]
-        img = cv2.imread(img_path)
+        with profiling.span("imread", file=Path(img_path).name):
+            img = cv2.imread(img_path)
         
         if img is None:
             print(f"Could not load image: {img_path}")
@@ -299,25 +617,24 @@ class PerfectOpenCVCalibration:
         
         print(f"Demonstrating undistortion on: {Path(img_path).name}")
         
-        # 歪み補正パラメータの計算
+        # 歪み補正マップの計算（画像サイズごとに1回）
         h, w = img.shape[:2]
-        new_camera_matrix, roi = cv2.getOptimalNewCameraMatrix(
-            self.camera_matrix, self.dist_coeffs, (w, h), 1, (w, h)
-        )
+        with profiling.span("init_undistort_maps"):
+            undistorter = self.get_undistorter((w, h))
         
         # 歪み補正実行
-        undistorted = cv2.undistort(img, self.camera_matrix, 
-                                   self.dist_coeffs, None, new_camera_matrix)
+        with profiling.span("undistort"):
+            undistorted = undistorter.undistort(img)
         
         # ROIでクロップ
-        x, y, w_roi, h_roi = roi
-        if w_roi > 0 and h_roi > 0:
-            undistorted_cropped = undistorted[y:y+h_roi, x:x+w_roi]
-        else:
-            undistorted_cropped = undistorted
+        x, y, w_roi, h_roi = undistorter.roi
+        undistorted_cropped = undistorter.crop(undistorted)
         
         # 比較表示
-        fig, axes = plt.subplots(1, 3, figsize=(18, 6))
+        if self.plots == "skip":
+            return undistorted, undistorted_cropped
+        fig = self._new_figure(figsize=(18, 6))
+        axes = fig.subplots(1, 3)
         
         # 元画像
         axes[0].imshow(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
@@ -334,9 +651,7 @@ class PerfectOpenCVCalibration:
         axes[2].set_title('Undistorted & Cropped\n(valid region)')
         axes[2].axis('off')
         
-        plt.tight_layout()
-        plt.savefig(str(self.output_dir / 'undistortion_demo.png'), dpi=300, bbox_inches='tight')
-        plt.show()
+        self._output_figure(fig, 'undistortion_demo.png')
         
         print("✓ Undistortion demonstration completed!")
         print(f"Original size: {img.shape[:2]}")
@@ -344,21 +659,59 @@ class PerfectOpenCVCalibration:
         
         return undistorted, undistorted_cropped
     
+    def _new_figure(self, figsize):
+        """表示モードならpyplotの図、それ以外はGUIを持たないFigure（Aggで描画）"""
+        if self.plots == "show":
+            return plt.figure(figsize=figsize)
+        return Figure(figsize=figsize)
+    
+    def _output_figure(self, fig, filename):
+        """図を保存（backgroundモードでは描画・PNGエンコードを別スレッドで実行）"""
+        fig.tight_layout()
+        path = str(self.output_dir / filename)
+        if self.plots == "background":
+            if self._plot_executor is None:
+                self._plot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plots")
+            self._plot_jobs.append(self._plot_executor.submit(self._save_figure, fig, path, filename))
+            return
+        self._save_figure(fig, path, filename)
+        plt.show()
+    
+    def _save_figure(self, fig, path, filename):
+        with profiling.span("savefig", file=filename):
+            fig.savefig(path, dpi=self.plot_dpi, bbox_inches='tight')
+    
+    def wait_for_plots(self):
+        """バックグラウンドで保存中の図の完了を待つ"""
+        jobs, self._plot_jobs = self._plot_jobs, []
+        for job in jobs:
+            try:
+                job.result()
+            except Exception as e:
+                print(f"✗ Failed to save figure: {e}")
+        if self._plot_executor is not None:
+            self._plot_executor.shutdown(wait=True)
+            self._plot_executor = None
+    
     def save_results(self):
         """校正結果をファイルに保存"""
         if self.camera_matrix is None:
             print("No calibration results to save")
             return
         
-        # NumPy形式で校正データ保存
+        # コーナー・姿勢は連続配列のストア（mmapで読み込み可能、pickle不要）に保存
+        CalibrationStore.save(self.output_dir / 'calibration_store', self.objp, self.image_points,
+                              self.image_files, self.image_size, self.checkerboard_size, self.square_size,
+                              camera_matrix=self.camera_matrix, dist_coeffs=self.dist_coeffs,
+                              rvecs=self.rvecs, tvecs=self.tvecs, rms_error=self.rms_error)
+        
+        # 内部パラメータはNumPy形式でも保存（undistort_batch.pyなどが参照）
         np.savez(str(self.output_dir / 'opencv_calibration.npz'),
                 camera_matrix=self.camera_matrix,
                 dist_coeffs=self.dist_coeffs,
-                rvecs=self.rvecs,
-                tvecs=self.tvecs,
+                rvecs=np.asarray(self.rvecs, dtype=np.float64).reshape(-1, 3),
+                tvecs=np.asarray(self.tvecs, dtype=np.float64).reshape(-1, 3),
                 rms_error=self.rms_error,
-                object_points=self.object_points,
-                image_points=self.image_points,
                 checkerboard_size=self.checkerboard_size,
                 square_size=self.square_size,
                 image_size=self.image_size)
@@ -387,6 +740,8 @@ class PerfectOpenCVCalibration:
                 'k3': float(self.dist_coeffs[0, 4]) if len(self.dist_coeffs[0]) > 4 else 0.0
             }
         }
+        if self.view_selection is not None:
+            summary['view_selection'] = self.view_selection
         
         with open(self.output_dir / 'calibration_summary.json', 'w') as f:
             json.dump(summary, f, indent=2)
@@ -422,21 +777,48 @@ class PerfectOpenCVCalibration:
         
         print(f"✓ All results saved to {self.output_dir}/")
         print("Generated files:")
+        print("  - calibration_store/ (corners, poses and image index)")
         print("  - opencv_calibration.npz (calibration data)")
         print("  - calibration_summary.json (structured summary)")
         print("  - calibration_report.txt (human-readable report)")
         print("  - opencv_calibration_analysis.png (visualization)")
         print("  - undistortion_demo.png (undistortion demo)")
     
-    def load_results(self):
-        """保存された校正結果を読み込み"""
-        calib_file = self.output_dir / 'opencv_calibration.npz'
+    def load_results(self, mmap_mode='r'):
+        """
+        保存された校正結果を読み込み
         
+        calibration_store/があればメモリマップで開き（配列はコピーしない）、
+        なければ旧形式のopencv_calibration.npzを読み込む。
+        """
+        store_dir = self.output_dir / 'calibration_store'
+        if CalibrationStore.exists(store_dir):
+            try:
+                store = CalibrationStore.load(store_dir, mmap_mode=mmap_mode)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading calibration store: {e}")
+            else:
+                self.camera_matrix = store.camera_matrix
+                self.dist_coeffs = store.dist_coeffs
+                self.rvecs, self.tvecs = store.poses()
+                self.rms_error = store.rms_error
+                self.object_points = store.object_points()
+                self.image_points = store.image_points()
+                self.image_files = store.image_files
+                self.image_size = store.image_size
+                
+                print(f"✓ Loaded calibration results from {store_dir}")
+                print(f"  - RMS error: {self.rms_error:.4f} pixels")
+                print(f"  - Images used: {len(self.object_points)}")
+                return True
+        
+        calib_file = self.output_dir / 'opencv_calibration.npz'
         if not calib_file.exists():
             print(f"No saved calibration found at {calib_file}")
             return False
         
         try:
+            # 旧形式（コーナーが可変長リストとしてpickleされている）
             data = np.load(calib_file, allow_pickle=True)
             self.camera_matrix = data['camera_matrix']
             self.dist_coeffs = data['dist_coeffs']
@@ -456,8 +838,24 @@ class PerfectOpenCVCalibration:
             print(f"Error loading calibration: {e}")
             return False
     
-    def run_complete_calibration(self, image_dir, skip_if_exists=True):
-        """完全な校正プロセスを実行"""
+    def run_complete_calibration(self, image_dir, skip_if_exists=True, load_existing=None):
+        """
+        完全な校正プロセスを実行（trace_path指定時は最後にトレースを保存）
+        
+        load_existing: 既存結果があるときに読み込むか（Noneなら対話的に確認、headlessでは読み込む）
+        """
+        try:
+            with profiling.span("run_complete_calibration", category="pipeline"):
+                return self._run_calibration_steps(image_dir, skip_if_exists, load_existing)
+        finally:
+            self.wait_for_plots()
+            if self.trace_path:
+                totals = profiling.export_chrome_trace(str(self.trace_path))
+                print(f"\nTrace written to {self.trace_path}")
+                for name, total in sorted(totals.items(), key=lambda item: -item[1]["total_s"]):
+                    print(f"  {name:<24} {total['total_s']:9.3f}s  ({total['count']} spans)")
+    
+    def _run_calibration_steps(self, image_dir, skip_if_exists, load_existing):
         print("Perfect OpenCV Camera Calibration")
         print("="*60)
         print(f"Checkerboard: {self.checkerboard_size} corners, {self.square_size}mm squares")
@@ -467,8 +865,12 @@ class PerfectOpenCVCalibration:
         # 既存結果のチェック
         if skip_if_exists and (self.output_dir / 'opencv_calibration.npz').exists():
             print("Found existing calibration results!")
-            choice = input("Load existing results? (y/n): ").lower().strip()
-            if choice in ['y', 'yes', '']:
+            if load_existing is None:
+                if self.headless:
+                    load_existing = True
+                else:
+                    load_existing = input("Load existing results? (y/n): ").lower().strip() in ['y', 'yes', '']
+            if load_existing:
                 if self.load_results():
                     print("\nSkipping calibration, using saved results...")
                     self.analyze_calibration_results()
@@ -484,27 +886,37 @@ class PerfectOpenCVCalibration:
             print("No images found!")
             return False
         
-        success = self.process_images(image_files)
+        with profiling.span("process_images", category="step"):
+            success = self.process_images(image_files)
         if not success:
             print("Failed to detect corners in any image!")
             return False
         
+        self.select_views()
+        
         print("\nStep 2: Calibrating camera with OpenCV...")
         if not self.calibrate_camera():
             print("Calibration failed!")
             return False
         
+        if self.outlier_settings['target_rms'] is not None or self.outlier_settings['max_drop'] is not None:
+            print("\nRejecting outlier views...")
+            self.reject_outliers(**self.outlier_settings)
+        
         print("\nStep 3: Analyzing calibration results...")
         _ = self.analyze_calibration_results()
         
         print("\nStep 4: Visualizing results...")
-        self.visualize_results()
+        with profiling.span("visualize_results", category="step"):
+            self.visualize_results()
         
         print("\nStep 5: Demonstrating undistortion...")
-        self.demonstrate_undistortion()
+        with profiling.span("demonstrate_undistortion", category="step"):
+            self.demonstrate_undistortion()
         
         print("\nStep 6: Saving all results...")
-        self.save_results()
+        with profiling.span("save_results", category="step"):
+            self.save_results()
         
         print("\n" + "="*60)
         print("PERFECT OPENCV CALIBRATION COMPLETED!")
@@ -523,30 +935,73 @@ def import_datetime():
     return datetime
 
 
+def parse_args():
+    """コマンドライン引数（既定値は従来の対話実行と同じ設定）"""
+    parser = argparse.ArgumentParser(description="OpenCV camera calibration")
+    parser.add_argument("--image-dir", default="./checkerboards", help="チェッカーボード画像のディレクトリ")
+    parser.add_argument("--output-dir", default="./calibration_results", help="結果の保存先")
+    parser.add_argument("--board", type=int, nargs=2, default=[7, 7], metavar=("COLS", "ROWS"),
+                        help="内部コーナー数")
+    parser.add_argument("--square-size", type=float, default=20.0, help="正方形のサイズ（mm）")
+    parser.add_argument("--workers", type=int, default=1, help="コーナー検出の並列プロセス数")
+    parser.add_argument("--detection-mode", choices=["full", "pyramid"], default="full")
+    parser.add_argument("--max-views", type=int, default=None,
+                        help="校正に使うビュー数の上限（被覆と姿勢の多様性で選択）")
+    parser.add_argument("--target-rms", type=float, default=None,
+                        help="この再投影誤差（px）になるまで誤差の大きいビューを除いて再校正")
+    parser.add_argument("--max-drop", type=int, default=None,
+                        help="外れ値として除外するビュー数の上限（既定・-1で無制限。--target-rmsなしで指定すると上限まで除外）")
+    parser.add_argument("--min-views", type=int, default=10, help="外れ値除外後に残す最小ビュー数")
+    parser.add_argument("--no-cache", action="store_true", help="コーナー検出キャッシュを使わない")
+    parser.add_argument("--headless", action="store_true",
+                        help="確認入力・画面表示を行わないバッチモード（図はバックグラウンドで保存）")
+    existing = parser.add_mutually_exclusive_group()
+    existing.add_argument("--load-existing", dest="load_existing", action="store_true", default=None,
+                          help="既存の校正結果があれば読み込む")
+    existing.add_argument("--recalibrate", dest="load_existing", action="store_false",
+                          help="既存の校正結果があっても校正し直す")
+    parser.add_argument("--plots", choices=["show", "background", "skip"], default=None,
+                        help="図の出力方法（既定: headlessならbackground、それ以外はshow）")
+    parser.add_argument("--plot-dpi", type=int, default=300, help="保存する図の解像度")
+    parser.add_argument("--trace", default=None, metavar="PATH", help="処理段階ごとの計測をChrome trace形式で保存")
+    return parser.parse_args()
+
+
 # メイン実行部分
 if __name__ == "__main__":
+    args = parse_args()
     print("Perfect OpenCV Camera Calibration Program")
     print("="*70)
     print(f"OpenCV version: {cv2.__version__}")
     print()
     
     # 設定
-    checkerboard_size = (7, 7)  # 内部コーナー数
-    square_size = 20.0  # mm
-    image_directory = "./checkerboards"
-    output_directory = "./calibration_results"
+    checkerboard_size = tuple(args.board)  # 内部コーナー数
+    output_directory = args.output_dir
     
     # 校正実行
     calibrator = PerfectOpenCVCalibration(
         checkerboard_size=checkerboard_size,
-        square_size=square_size,
-        output_dir=output_directory
+        square_size=args.square_size,
+        output_dir=output_directory,
+        n_workers=args.workers,
+        max_views=args.max_views,
+        target_rms=args.target_rms,
+        max_drop=args.max_drop,
+        min_views=args.min_views,
+        use_cache=not args.no_cache,
+        detection_mode=args.detection_mode,
+        trace_path=args.trace,
+        headless=args.headless,
+        plots=args.plots,
+        plot_dpi=args.plot_dpi
     )
     
     # 完全な校正プロセスを実行
     success = calibrator.run_complete_calibration(
-        image_dir=image_directory,
-        skip_if_exists=True  # 既存結果があれば確認
+        image_dir=args.image_dir,
+        skip_if_exists=True,  # 既存結果があれば確認（--load-existing/--recalibrateで指定可能）
+        load_existing=args.load_existing
     )
     
     if success:
@@ -561,4 +1016,7 @@ if __name__ == "__main__":
     print("2. Use calibration_report.txt for numerical results")
     print("3. Include opencv_calibration_analysis.png in your report")
     print("4. Use undistortion_demo.png to show practical benefits")
-    print("="*70)
\ No newline at end of file
+    print("="*70)
+    
+    if args.headless and not success:
+        raise SystemExit(1)
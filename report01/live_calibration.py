@@ -0,0 +1,131 @@
+"""
+撮影と同時に校正を進めるライブキャプチャ
+
+カメラ・動画ファイル・画像ディレクトリからフレームを読み込み、
+チェッカーボード検出をバックグラウンドスレッドで実行する（表示ループは待たない）。
+ボードが検出され、画像上の新しい領域を覆う（または姿勢が異なる）フレームだけを残し、
+一定枚数ごとに校正を解き直す。撮影終了時点で校正結果が得られる。
+
+使い方:
+    python live_calibration.py 0 --save-dir captures/                  # カメラ（q / Enterで終了）
+    python live_calibration.py input.mp4 --headless                    # 動画ファイル
+    python live_calibration.py checkerboards/ --headless --output-dir live_results/
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from utils.calibration_store import CalibrationStore
+from utils.live_capture import LiveCalibrator, iterate_source
+
+
+def draw_overlay(frame, calibrator):
+    """最新の検出結果と進捗を描画"""
+    status = calibrator.status()
+    corners = calibrator.last_corners
+    if corners is not None:
+        cv2.drawChessboardCorners(frame, calibrator.board_size, corners, True)
+    rms = f"{status['rms']:.3f}px" if status['rms'] is not None else "-"
+    text = (f"views {status['views_kept']}  coverage {status['coverage'] * 100:.0f}%  "
+            f"RMS {rms}  solves {status['solves']}")
+    cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    return frame
+
+
+def save_calibration(calibrator, output_dir, image_files):
+    """校正結果をCalibrationStoreとopencv_calibration.npz（undistort_batch.py用）に保存"""
+    rms, camera_matrix, dist_coeffs, rvecs, tvecs = calibrator.calibration
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    CalibrationStore.save(output_dir / 'calibration_store', calibrator.objp, calibrator.image_points,
+                          image_files, calibrator.image_size, calibrator.board_size,
+                          calibrator.square_size,
+                          camera_matrix=camera_matrix, dist_coeffs=dist_coeffs,
+                          rvecs=rvecs, tvecs=tvecs, rms_error=rms)
+    np.savez(str(output_dir / 'opencv_calibration.npz'),
+             camera_matrix=camera_matrix, dist_coeffs=dist_coeffs,
+             rvecs=np.asarray(rvecs, dtype=np.float64).reshape(-1, 3),
+             tvecs=np.asarray(tvecs, dtype=np.float64).reshape(-1, 3),
+             rms_error=rms, checkerboard_size=calibrator.board_size,
+             square_size=calibrator.square_size, image_size=calibrator.image_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect and calibrate while capturing")
+    parser.add_argument("source", help="camera index, video file or image directory")
+    parser.add_argument("--board", type=int, nargs=2, default=[7, 7], metavar=("COLS", "ROWS"))
+    parser.add_argument("--square-size", type=float, default=20.0, help="正方形のサイズ（mm）")
+    parser.add_argument("--output-dir", default="./live_calibration_results")
+    parser.add_argument("--save-dir", default=None, help="採用したフレームの保存先")
+    parser.add_argument("--resolve-every", type=int, default=5, help="この枚数のビューを採用するごとに再校正")
+    parser.add_argument("--min-views", type=int, default=8, help="最初の校正に必要なビュー数")
+    parser.add_argument("--detection-max-dim", type=int, default=640, help="ボード探索に使う縮小画像の長辺")
+    parser.add_argument("--headless", action="store_true", help="プレビューを表示しない")
+    parser.add_argument("--realtime", action="store_true",
+                        help="ファイル入力でも検出が追いつかないフレームを捨てる（カメラでは常に有効）")
+    parser.add_argument("--fps", type=float, default=None, help="ファイル入力をこのfpsで読み込む")
+    args = parser.parse_args()
+
+    is_camera = args.source.isdigit()
+    save_dir = Path(args.save_dir) if args.save_dir else None
+    if save_dir:
+        save_dir.mkdir(parents=True, exist_ok=True)
+    saved_files = {}
+
+    def on_view(index, frame, corners):
+        # 検出スレッドで呼ばれる（表示ループは止めない）
+        name = f"frame_{index:06d}.png"
+        if save_dir:
+            cv2.imwrite(str(save_dir / name), frame)
+            name = str(save_dir / name)
+        saved_files[index] = name
+
+    calibrator = LiveCalibrator(tuple(args.board), args.square_size, resolve_every=args.resolve_every,
+                                min_views=args.min_views, detection_max_dim=args.detection_max_dim,
+                                on_view=on_view)
+    block = not (is_camera or args.realtime)
+    window = "Live calibration (q / Enter to stop)"
+
+    start = time.perf_counter()
+    try:
+        for index, frame in iterate_source(args.source, fps_limit=args.fps):
+            # 表示用に描画するため、検出にはコピーを渡す
+            calibrator.submit(frame.copy() if not args.headless else frame, index, block=block)
+            if not args.headless:
+                cv2.imshow(window, draw_overlay(frame, calibrator))
+                if cv2.waitKey(1) & 0xFF in (ord('q'), 13):
+                    break
+    except KeyboardInterrupt:
+        print("\nStopping capture...")
+    finally:
+        if not args.headless:
+            cv2.destroyAllWindows()
+    capture_time = time.perf_counter() - start
+
+    calibration = calibrator.finish()
+    status = calibrator.status()
+    print(f"Frames: {status['frames_submitted']} submitted, {status['frames_dropped']} dropped, "
+          f"{status['frames_detected']} with a board")
+    print(f"Views kept: {status['views_kept']}, coverage {status['coverage'] * 100:.1f}%, "
+          f"{status['solves']} solves")
+    print(f"Capture time: {capture_time:.2f}s, ready {time.perf_counter() - start - capture_time:.2f}s later")
+    if calibrator.error is not None:
+        print(f"⚠ {status['detection_errors']} detection and {status['solve_errors']} solve errors "
+              f"(first: {type(calibrator.error).__name__}: {calibrator.error})")
+
+    if calibration is None:
+        print(f"✗ Not enough views for calibration (need {args.min_views})")
+        raise SystemExit(1)
+
+    image_files = [saved_files.get(i, f"frame_{i:06d}") for i in calibrator.frame_indices]
+    save_calibration(calibrator, args.output_dir, image_files)
+    print(f"✓ RMS reprojection error: {calibration[0]:.4f} pixels")
+    print(f"✓ Results saved to {args.output_dir}/")
+
+
+if __name__ == "__main__":
+    main()
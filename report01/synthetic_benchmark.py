@@ -0,0 +1,170 @@
+"""
+合成データによる校正のスケール・回帰ベンチマーク（カメラ不要・オフライン）
+
+既知のカメラ行列・歪み係数のもとでチェッカーボードをランダムな姿勢に描画し
+（コントラスト・ぼけ・ノイズもランダム）、画像と真値（コーナー・姿勢・内部パラメータ）を生成する。
+そのうえでビュー数Nを増やしながら次を測定する。
+- コーナー検出のスループット（枚/秒）
+- 校正（cv2.calibrateCamera）の所要時間
+- 推定した内部パラメータ・歪みモデルの真値からのずれ、検出コーナーの真値からの誤差
+
+使い方:
+    python synthetic_benchmark.py                                          # 1000枚生成し N=10..1000 を測定
+    python synthetic_benchmark.py --views 5000 --sizes 100 1000 5000 --workers 8
+    python synthetic_benchmark.py --generate-only --dataset-dir synthetic_data
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from experiments import PerfectOpenCVCalibration
+from utils.calibration_store import CalibrationStore
+from utils.synthetic import corner_errors, dataset_settings, generate_dataset, intrinsics_error
+
+
+def load_or_generate(args):
+    """生成設定（ボード・画像サイズ・シード・ぼけ・ノイズ）が一致し枚数が足りる既存データセットを再利用"""
+    dataset_dir = Path(args.dataset_dir)
+    n_views = max(args.views, max(args.sizes))
+    store_dir = dataset_dir / 'ground_truth'
+    if not args.regenerate and CalibrationStore.exists(store_dir):
+        store = CalibrationStore.load(store_dir)
+        settings = dataset_settings(args.seed, args.blur, args.noise)
+        if (len(store) >= n_views and store.checkerboard_size == tuple(args.board)
+                and store.image_size == tuple(args.image_size) and store.square_size == args.square_size
+                and store.metadata == settings):
+            print(f"Using existing dataset: {dataset_dir} ({len(store)} views)")
+            return store
+        print(f"Existing dataset in {dataset_dir} does not match the requested settings")
+
+    print(f"Generating {n_views} synthetic views in {dataset_dir}...")
+    start = time.perf_counter()
+    store = generate_dataset(dataset_dir, n_views, board_size=tuple(args.board), square_size=args.square_size,
+                             image_size=tuple(args.image_size), seed=args.seed, blur=tuple(args.blur),
+                             noise=tuple(args.noise), n_workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"✓ Generated {n_views} views in {elapsed:.1f}s ({n_views / elapsed:.1f} views/s)")
+    return store
+
+
+def benchmark_size(store, n_views, args):
+    """先頭n_views枚で検出→校正を行い、時間と真値からの誤差を返す"""
+    image_files = store.image_files[:n_views]
+    calibrator = PerfectOpenCVCalibration(
+        checkerboard_size=store.checkerboard_size, square_size=store.square_size, output_dir=args.output_dir,
+        n_workers=args.workers, use_cache=False, detection_mode=args.detection_mode, headless=True, plots="skip"
+    )
+    # 1枚ごとの検出ログは測定の邪魔になるので捨てる
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter_ns()
+        calibrator.process_images(image_files, show_progress=False)
+        detection_s = (time.perf_counter_ns() - start) / 1e9
+        start = time.perf_counter_ns()
+        calibrated = calibrator.calibrate_camera()
+        calibration_s = (time.perf_counter_ns() - start) / 1e9
+
+    result = {
+        'n_views': n_views,
+        'detected': len(calibrator.image_points),
+        'detection_s': detection_s,
+        'images_per_s': n_views / detection_s,
+        'calibration_s': calibration_s if calibrated else None,
+        'rms_error': calibrator.rms_error,
+    }
+    if calibrator.image_points:
+        index = {f: i for i, f in enumerate(store.image_files)}
+        errors = np.concatenate([corner_errors(corners, store.corners[index[f]])
+                                 for f, corners in zip(calibrator.image_files, calibrator.image_points)])
+        result['corner_error_mean_px'] = float(errors.mean())
+        result['corner_error_max_px'] = float(errors.max())
+    if calibrated:
+        k = calibrator.camera_matrix
+        result.update({'fx': k[0, 0], 'fy': k[1, 1], 'cx': k[0, 2], 'cy': k[1, 2]})
+        result.update(intrinsics_error(k, calibrator.dist_coeffs, store.camera_matrix, store.dist_coeffs,
+                                       store.image_size))
+    return result
+
+
+def save_results(results, store, args):
+    """ベンチマーク結果をJSON（環境・真値付き）とCSVで保存"""
+    output_dir = Path(args.output_dir)
+    fieldnames = ['n_views', 'detected', 'detection_s', 'images_per_s', 'calibration_s', 'rms_error',
+                  'corner_error_mean_px', 'corner_error_max_px', 'fx', 'fy', 'cx', 'cy',
+                  'fx_rel_error', 'fy_rel_error', 'cx_error_px', 'cy_error_px',
+                  'distortion_mean_px', 'distortion_max_px']
+    with open(output_dir / 'synthetic_benchmark.csv', 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+    with open(output_dir / 'synthetic_benchmark.json', 'w', encoding='utf-8') as f:
+        json.dump({
+            'environment': {'cpu_count': os.cpu_count(), 'platform': platform.platform(),
+                            'python': platform.python_version(), 'numpy': np.__version__,
+                            'opencv': cv2.__version__},
+            'settings': vars(args),
+            'ground_truth': {'camera_matrix': np.asarray(store.camera_matrix).tolist(),
+                             'dist_coeffs': np.asarray(store.dist_coeffs).ravel().tolist()},
+            'results': results,
+        }, f, indent=2, ensure_ascii=False, default=float)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Calibration benchmark on synthetic checkerboard images")
+    parser.add_argument("--dataset-dir", default="./synthetic_data", help="合成画像と真値の保存先")
+    parser.add_argument("--output-dir", default="./synthetic_benchmark_results", help="ベンチマーク結果の保存先")
+    parser.add_argument("--views", type=int, default=1000, help="生成するビュー数")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 30, 100, 300, 1000],
+                        help="測定するビュー数N（データセットの先頭N枚を使用）")
+    parser.add_argument("--board", type=int, nargs=2, default=[7, 7], metavar=("COLS", "ROWS"),
+                        help="内部コーナー数")
+    parser.add_argument("--square-size", type=float, default=20.0, help="正方形のサイズ（mm）")
+    parser.add_argument("--image-size", type=int, nargs=2, default=[1280, 960], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--blur", type=float, nargs=2, default=[0.0, 1.5], metavar=("MIN", "MAX"),
+                        help="ガウシアンぼけσの範囲（px）")
+    parser.add_argument("--noise", type=float, nargs=2, default=[0.0, 4.0], metavar=("MIN", "MAX"),
+                        help="ガウシアンノイズσの範囲（階調）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="生成・コーナー検出の並列プロセス数")
+    parser.add_argument("--detection-mode", choices=["full", "pyramid"], default="full")
+    parser.add_argument("--regenerate", action="store_true", help="既存のデータセットがあっても生成し直す")
+    parser.add_argument("--generate-only", action="store_true", help="データセットの生成だけ行う")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    store = load_or_generate(args)
+    if args.generate_only:
+        return
+
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    results = []
+    print(f"\n{'N':>6} {'found':>6} {'img/s':>8} {'calib s':>8} {'RMS px':>7} {'corner px':>9} "
+          f"{'fx err %':>8} {'dist px':>8}")
+    for n_views in sorted(set(args.sizes)):
+        result = benchmark_size(store, n_views, args)
+        results.append(result)
+        if result['calibration_s'] is None:
+            print(f"{n_views:>6} {result['detected']:>6} {result['images_per_s']:>8.1f}  calibration failed")
+            continue
+        print(f"{n_views:>6} {result['detected']:>6} {result['images_per_s']:>8.1f} "
+              f"{result['calibration_s']:>8.3f} {result['rms_error']:>7.4f} {result['corner_error_mean_px']:>9.4f} "
+              f"{result['fx_rel_error'] * 100:>8.4f} {result['distortion_mean_px']:>8.4f}")
+
+    save_results(results, store, args)
+    print(f"\n✓ Results saved to {args.output_dir}/synthetic_benchmark.{{json,csv}}")
+
+
+if __name__ == "__main__":
+    main()
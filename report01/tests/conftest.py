@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+# The report01 scripts import their helpers as `utils.*` from the report01 directory
+# Both reports have a top-level `experiments` module, so run each report's tests in its
+# own session: python -m pytest report01/tests
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+BOARD_SIZE = (7, 6)
+IMAGE_SIZE = (1280, 960)
+
+
+@pytest.fixture
+def synthetic_views():
+    """Projected corners of random board poses with a known camera and 0.1 px corner noise"""
+    rng = np.random.default_rng(0)
+    camera_matrix = np.array([[1100.0, 0.0, 650.0], [0.0, 1100.0, 470.0], [0.0, 0.0, 1.0]])
+    dist_coeffs = np.array([-0.2, 0.05, 0.001, -0.001, 0.0])
+    objp = np.zeros((BOARD_SIZE[0] * BOARD_SIZE[1], 3), np.float32)
+    objp[:, :2] = np.mgrid[0:BOARD_SIZE[0], 0:BOARD_SIZE[1]].T.reshape(-1, 2) * 20.0
+
+    rvecs, tvecs, imgpoints = [], [], []
+    for _ in range(20):
+        rvec = rng.uniform(-0.4, 0.4, 3).reshape(3, 1)
+        tvec = np.array([rng.uniform(-80, 20), rng.uniform(-60, 10), rng.uniform(350, 600)]).reshape(3, 1)
+        projected, _ = cv2.projectPoints(objp, rvec, tvec, camera_matrix, dist_coeffs)
+        imgpoints.append((projected + rng.normal(0, 0.1, projected.shape)).astype(np.float32))
+        rvecs.append(rvec)
+        tvecs.append(tvec)
+    return {'objpoints': [objp] * len(imgpoints), 'imgpoints': imgpoints, 'rvecs': rvecs, 'tvecs': tvecs,
+            'camera_matrix': camera_matrix, 'dist_coeffs': dist_coeffs, 'image_size': IMAGE_SIZE,
+            'board_size': BOARD_SIZE}
@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+from utils.calibrate import reject_outlier_views, reprojection_errors, reprojection_residuals, rodrigues_batch
+
+
+def _calibrate(views):
+    return cv2.calibrateCamera(views['objpoints'], views['imgpoints'], views['image_size'], None, None)
+
+
+def test_rodrigues_batch_matches_cv2():
+    rvecs = np.random.default_rng(1).uniform(-2, 2, (10, 3))
+    rvecs[0] = 0.0
+    expected = np.stack([cv2.Rodrigues(r)[0] for r in rvecs])
+    np.testing.assert_allclose(rodrigues_batch(rvecs), expected, atol=1e-12)
+
+
+def test_residuals_match_project_points(synthetic_views):
+    v = synthetic_views
+    residuals = reprojection_residuals(v['objpoints'], v['imgpoints'], v['rvecs'], v['tvecs'],
+                                       v['camera_matrix'], v['dist_coeffs'])
+    for i, (objp, corners) in enumerate(zip(v['objpoints'], v['imgpoints'])):
+        projected, _ = cv2.projectPoints(objp.astype(np.float64), v['rvecs'][i], v['tvecs'][i],
+                                         v['camera_matrix'], v['dist_coeffs'])
+        np.testing.assert_allclose(residuals[i], (projected - corners).reshape(-1, 2), atol=1e-6)
+
+
+def test_reprojection_rms_matches_calibrate_camera(synthetic_views):
+    rms, K, dist, rvecs, tvecs = _calibrate(synthetic_views)
+    errors = reprojection_errors(synthetic_views['objpoints'], synthetic_views['imgpoints'], rvecs, tvecs, K, dist)
+    assert errors['view_rms'].shape == (len(rvecs),)
+    assert abs(errors['rms'] - rms) < 1e-6
+
+
+def _with_bad_views(views, bad=(3, 11), shift=3.0):
+    views = dict(views, imgpoints=list(views['imgpoints']))
+    rng = np.random.default_rng(2)
+    for i in bad:
+        noise = rng.normal(0, shift, views['imgpoints'][i].shape)
+        views['imgpoints'][i] = (views['imgpoints'][i] + noise).astype(np.float32)
+    return views
+
+
+def _reject(views, **kwargs):
+    _, K, dist, rvecs, tvecs = _calibrate(views)
+    return reject_outlier_views(views['objpoints'], views['imgpoints'], views['image_size'], K, dist,
+                                rvecs, tvecs, **kwargs)
+
+
+def test_target_rms_without_budget_drops_the_bad_views(synthetic_views):
+    views = _with_bad_views(synthetic_views)
+    kept, solution, history = _reject(views, target_rms=0.2, min_views=10)
+    assert set(range(20)) - set(kept) == {3, 11}
+    assert solution[0] <= 0.2
+    assert history[0]['rms'] > solution[0]
+
+
+def test_zero_budget_drops_nothing(synthetic_views):
+    views = _with_bad_views(synthetic_views)
+    kept, solution, history = _reject(views, target_rms=0.2, max_drop=0)
+    assert kept == list(range(20))
+    assert len(history) == 1
+
+
+def test_stops_at_max_drop_and_min_views(synthetic_views):
+    kept, _, _ = _reject(synthetic_views, max_drop=3, min_views=5)
+    assert len(kept) == 17
+    kept, _, _ = _reject(synthetic_views, min_views=15)
+    assert len(kept) == 15
+
+
+def test_stops_immediately_when_target_met(synthetic_views):
+    kept, solution, history = _reject(synthetic_views, target_rms=1.0)
+    assert kept == list(range(20))
+    assert len(history) == 1
+
+
+def test_calibrator_target_rms_alone_rejects_outliers(synthetic_views, tmp_path, capsys):
+    from experiments import PerfectOpenCVCalibration
+
+    views = _with_bad_views(synthetic_views)
+    calibrator = PerfectOpenCVCalibration(views['board_size'], square_size=20.0, output_dir=tmp_path,
+                                          use_cache=False, headless=True, plots="skip", target_rms=0.2)
+    calibrator.object_points = list(views['objpoints'])
+    calibrator.image_points = list(views['imgpoints'])
+    calibrator.image_files = [f"view_{i}.png" for i in range(len(views['imgpoints']))]
+    calibrator.image_size = views['image_size']
+    assert calibrator.calibrate_camera()
+    rejected = calibrator.reject_outliers(**calibrator.outlier_settings)
+    assert sorted(rejected) == ["view_11.png", "view_3.png"]
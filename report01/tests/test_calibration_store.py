@@ -0,0 +1,45 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.calibration_store import CalibrationStore
+
+
+def test_save_load_round_trip_feeds_calibrate_camera(synthetic_views, tmp_path):
+    views = synthetic_views
+    rms, camera_matrix, dist_coeffs, rvecs, tvecs = cv2.calibrateCamera(
+        views['objpoints'], views['imgpoints'], views['image_size'], None, None)
+    files = [f"view{i:02d}.png" for i in range(len(views['imgpoints']))]
+    CalibrationStore.save(tmp_path, views['objpoints'][0], views['imgpoints'], files, views['image_size'],
+                          views['board_size'], 20.0, camera_matrix, dist_coeffs, rvecs, tvecs, rms,
+                          metadata={"seed": 0})
+
+    store = CalibrationStore.load(tmp_path)
+    assert isinstance(store.corners, np.memmap)
+    assert len(store) == len(files) and store.image_files == files
+    assert store.image_size == tuple(views['image_size']) and store.metadata == {"seed": 0}
+    assert store.rms_error == pytest.approx(rms)
+    np.testing.assert_array_equal(store.camera_matrix, camera_matrix)
+    rvecs_loaded, _ = store.poses()
+    np.testing.assert_allclose(np.hstack(rvecs_loaded), np.hstack(rvecs))
+
+    rms_again, camera_again, *_ = cv2.calibrateCamera(store.object_points(), store.image_points(),
+                                                      store.image_size, None, None)
+    assert rms_again == pytest.approx(rms, rel=1e-4)
+    np.testing.assert_allclose(camera_again, camera_matrix, rtol=1e-4)
+
+
+def test_load_rejects_inconsistent_index(synthetic_views, tmp_path):
+    views = synthetic_views
+    files = [f"view{i:02d}.png" for i in range(len(views['imgpoints']))]
+    CalibrationStore.save(tmp_path, views['objpoints'][0], views['imgpoints'], files, views['image_size'],
+                          views['board_size'], 20.0)
+    assert CalibrationStore.load(tmp_path).poses() == (None, None)
+
+    index = json.loads((tmp_path / 'index.json').read_text())
+    index['image_files'] = files[:-1]
+    (tmp_path / 'index.json').write_text(json.dumps(index))
+    with pytest.raises(ValueError):
+        CalibrationStore.load(tmp_path)
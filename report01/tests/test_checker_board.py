@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.checker_board import checkerboard_array, create_checkerboard, save_board, write_checkerboard_png
+
+
+@pytest.mark.parametrize("cols, rows, square, margin, dpi, strip_rows", [
+    (8, None, 50, 0, None, 1024),
+    (9, 6, 37, 23, 600, 64),  # strips that do not line up with squares or margins
+    (5, 4, 3, 0, 300, 1),
+])
+def test_streamed_png_matches_save_board(tmp_path, cols, rows, square, margin, dpi, strip_rows):
+    reference = tmp_path / "reference.png"
+    streamed = tmp_path / "streamed.png"
+    save_board(create_checkerboard(cols, square, rows=rows, margin=margin), reference, dpi=dpi)
+    size = write_checkerboard_png(streamed, cols, rows, square, margin, dpi=dpi, strip_rows=strip_rows)
+
+    with Image.open(streamed) as image, Image.open(reference) as expected:
+        assert image.size == expected.size == size
+        assert image.mode == expected.mode == "L"
+        assert image.info.get("dpi") == expected.info.get("dpi")
+        np.testing.assert_array_equal(np.asarray(expected), checkerboard_array(cols, rows, square, margin))
+        np.testing.assert_array_equal(np.asarray(image), np.asarray(expected))
+
+
+def test_save_board_rejects_lossy_formats(tmp_path):
+    with pytest.raises(ValueError):
+        save_board(checkerboard_array(4), tmp_path / "board.jpg")
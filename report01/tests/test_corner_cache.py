@@ -0,0 +1,37 @@
+import shutil
+
+import numpy as np
+
+from utils.corner_cache import CornerCache
+
+
+def test_keys_follow_content_and_settings(tmp_path):
+    image = tmp_path / "a.png"
+    image.write_bytes(b"image bytes")
+    renamed = tmp_path / "b.png"
+    shutil.copy(image, renamed)
+
+    key = CornerCache.make_key(image, board=(7, 6))
+    assert CornerCache.make_key(renamed, board=(7, 6)) == key
+    assert CornerCache.make_key(image, board=(8, 6)) != key
+    assert CornerCache.make_key(tmp_path / "missing.png", board=(7, 6)) is None
+    image.write_bytes(b"other bytes")
+    assert CornerCache.make_key(image, board=(7, 6)) != key
+
+
+def test_round_trip_including_misses_and_broken_entries(tmp_path):
+    cache = CornerCache(tmp_path / "cache")
+    corners = np.random.default_rng(5).uniform(0, 100, (42, 1, 2)).astype(np.float32)
+    cache.put("found", (640, 480), corners)
+    cache.put("not_found", (640, 480), None)
+    (tmp_path / "cache" / "broken.npz").write_bytes(b"truncated")
+
+    hit = cache.get("found")
+    assert hit["image_size"] == (640, 480)
+    np.testing.assert_array_equal(hit["corners"], corners)
+    assert cache.get("not_found") == {"image_size": (640, 480), "corners": None}
+    assert cache.get("broken") is None
+    assert cache.get("absent") is None
+
+    cache.clear()
+    assert cache.get("found") is None
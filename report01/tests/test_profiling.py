@@ -0,0 +1,76 @@
+import importlib.util
+import multiprocessing
+import os
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from utils import profiling
+
+
+@pytest.fixture
+def memory_profiling():
+    profiling.enable(memory=True)
+    yield profiling
+    profiling.collect()
+    profiling.disable()
+
+
+def spans(events):
+    return {event["name"]: event for event in events if event["ph"] == "X"}
+
+
+def test_nested_spans_report_their_own_peak(memory_profiling):
+    with profiling.span("outer"):
+        big = np.ones(4 * 2**20 // 8)  # 4 MiB
+        del big
+        with profiling.span("inner"):
+            small = np.ones(2**17 // 8)  # 128 KiB
+            del small
+    events = spans(profiling.collect())
+    assert events["inner"]["args"]["peak_traced_mb"] < 1
+    assert events["outer"]["args"]["peak_traced_mb"] >= 4
+
+
+def test_thread_spans_are_timed_without_peak(memory_profiling):
+    def work():
+        with profiling.span("background"):
+            np.ones(2**17 // 8)
+
+    with profiling.span("main"):
+        thread = threading.Thread(target=work)
+        thread.start()
+        big = np.ones(4 * 2**20 // 8)
+        thread.join()
+        del big
+    events = spans(profiling.collect())
+    assert "args" not in events["background"]
+    assert events["background"]["dur"] >= 0
+    assert events["main"]["args"]["peak_traced_mb"] >= 4
+    assert tracemalloc.is_tracing()
+
+
+def test_report02_shim_loads_the_same_implementation():
+    shim = Path(__file__).resolve().parents[2] / "report02" / "profiling.py"
+    spec = importlib.util.spec_from_file_location("profiling", shim)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    loaded = sys.modules.pop("profiling")
+    assert Path(loaded.__file__).resolve() == Path(profiling.__file__).resolve()
+
+
+def _buffered_event_count():
+    return len(profiling._events)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_does_not_inherit_parent_events(memory_profiling):
+    with profiling.span("parent"):
+        pass
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        assert pool.apply(_buffered_event_count) == 0
+    assert len(profiling.collect()) > 0
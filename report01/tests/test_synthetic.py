@@ -0,0 +1,23 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils.synthetic import DEFAULT_DIST_COEFFS, _undistort_points, default_camera_matrix, intrinsics_error
+
+IMAGE_SIZE = (1280, 960)
+
+
+def test_undistort_points_inverts_project_points():
+    camera_matrix = default_camera_matrix(IMAGE_SIZE)
+    rays = np.random.default_rng(6).uniform(-0.5, 0.5, (200, 2))
+    points = np.column_stack([rays, np.ones(len(rays))])
+    pixels, _ = cv2.projectPoints(points, np.zeros(3), np.zeros(3), camera_matrix, DEFAULT_DIST_COEFFS)
+    recovered = _undistort_points(pixels, camera_matrix, DEFAULT_DIST_COEFFS)
+    np.testing.assert_allclose(recovered.reshape(-1, 2), rays, atol=1e-8)
+
+
+def test_intrinsics_error_is_zero_for_the_true_model():
+    camera_matrix = default_camera_matrix(IMAGE_SIZE)
+    errors = intrinsics_error(camera_matrix, DEFAULT_DIST_COEFFS, camera_matrix, DEFAULT_DIST_COEFFS, IMAGE_SIZE)
+    assert errors['fx_rel_error'] == 0 and errors['cx_error_px'] == 0
+    assert errors['distortion_max_px'] == pytest.approx(0, abs=1e-4)
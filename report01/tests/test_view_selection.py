@@ -0,0 +1,32 @@
+import numpy as np
+
+from utils.view_selection import coverage_masks, pose_features, select_views
+
+
+def test_budget_and_coverage(synthetic_views):
+    views = synthetic_views
+    indices, report = select_views(views['imgpoints'], views['image_size'], views['board_size'], max_views=8)
+    assert len(indices) == 8 and indices == sorted(set(indices))
+    assert report['views_total'] == 20 and report['views_selected'] == 8
+    assert 0 < report['coverage_selected'] <= report['coverage_all'] <= 1
+
+    masks = coverage_masks(views['imgpoints'], views['image_size'], views['board_size'])
+    assert report['coverage_selected'] == masks[indices].any(axis=0).mean()
+    # The greedy start is the view covering the most cells
+    assert int(np.argmax(masks.sum(axis=1))) in indices
+
+
+def test_near_duplicates_are_dropped(synthetic_views):
+    views = synthetic_views
+    repeated = list(views['imgpoints']) + [points + 0.5 for points in views['imgpoints']]
+    indices, report = select_views(repeated, views['image_size'], views['board_size'], max_views=len(repeated))
+    assert len(indices) == 20
+    assert report['duplicates_dropped'] == 20
+    features = pose_features(repeated, views['image_size'], views['board_size'])
+    np.testing.assert_allclose(features[:20], features[20:], atol=1e-3)
+
+
+def test_no_views():
+    assert select_views([], (640, 480), (7, 6), max_views=5) == ([], {
+        'views_total': 0, 'views_selected': 0, 'duplicates_dropped': 0, 'coverage_all': 0.0,
+        'coverage_selected': 0.0})
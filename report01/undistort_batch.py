@@ -0,0 +1,232 @@
+"""
+校正結果を使ったバッチ歪み補正（ヘッドレス）
+
+画像ディレクトリまたは動画ファイルを入力とし、歪み補正した結果を書き出す。
+デコード・remap・エンコードは上限付きキューで接続した
+reader / worker / writer スレッドで並行に実行する（OpenCVの処理はGILを解放する）。
+
+使い方:
+    python undistort_batch.py calibration_results/opencv_calibration.npz checkerboards/ undistorted/
+    python undistort_batch.py calibration_results/opencv_calibration.npz input.mp4 output.mp4 --workers 4
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+from utils.undistort import Undistorter
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'}
+_DONE = object()
+
+
+def iter_image_frames(input_dir):
+    """ディレクトリ内の画像を (名前, 画像) で順に返す"""
+    for path in sorted(Path(input_dir).iterdir()):
+        if path.suffix.lower() in IMAGE_EXTENSIONS:
+            yield path.name, cv2.imread(str(path))
+
+
+def iter_video_frames(video_file):
+    """動画のフレームを (フレーム番号, 画像) で順に返す"""
+    cap = cv2.VideoCapture(str(video_file))
+    if not cap.isOpened():
+        raise OSError(f"Could not open video: {video_file}")
+    try:
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+class ImageDirectoryWriter:
+    """補正済み画像をディレクトリに書き出す"""
+
+    def __init__(self, output_dir, extension=None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.extension = extension
+
+    def write(self, name, frame):
+        path = self.output_dir / name
+        if self.extension:
+            path = path.with_suffix(self.extension)
+        if not cv2.imwrite(str(path), frame):
+            raise OSError(f"Could not write {path}")
+
+    def close(self):
+        pass
+
+
+class VideoFileWriter:
+    """補正済みフレームを動画ファイルに書き出す（最初のフレームでサイズを決定）"""
+
+    def __init__(self, output_file, fps, fourcc="mp4v"):
+        self.output_file = Path(output_file)
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.writer = None
+
+    def write(self, name, frame):
+        if self.writer is None:
+            h, w = frame.shape[:2]
+            self.writer = cv2.VideoWriter(str(self.output_file), self.fourcc, self.fps, (w, h))
+            if not self.writer.isOpened():
+                raise OSError(f"Could not open video writer: {self.output_file}")
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+def run_pipeline(frames, undistorter, sink, n_workers=2, queue_size=16, crop=False, report_interval=2.0):
+    """
+    reader / worker / writer パイプラインで歪み補正を実行
+
+    Parameters:
+    frames: (名前, 画像) のイテラブル（読み込み失敗はNone）
+    undistorter: Undistorter
+    sink: write(name, frame) / close() を持つ出力先
+    n_workers: remapを実行するスレッド数
+    queue_size: 各キューの上限（メモリ使用量の上限）
+    crop: 有効領域(ROI)で切り出すか
+
+    Returns:
+    dict: frames, failed, elapsed, fps
+    """
+    in_queue = queue.Queue(maxsize=queue_size)
+    out_queue = queue.Queue(maxsize=queue_size)
+    stats = {'frames': 0, 'failed': 0}
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        try:
+            for index, (name, frame) in enumerate(frames):
+                if stop.is_set():
+                    break
+                in_queue.put((index, name, frame))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(n_workers):
+                in_queue.put(_DONE)
+
+    def worker():
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                out_queue.put(_DONE)
+                return
+            index, name, frame = item
+            try:
+                result = undistorter.undistort(frame, crop=crop) if frame is not None else None
+            except Exception as e:
+                print(f"✗ {name}: {e}")
+                result = None
+            out_queue.put((index, name, result))
+
+    def writer():
+        # フレーム順を保って書き出す
+        pending = {}
+        next_index = 0
+        finished_workers = 0
+        start = last_report = time.perf_counter()
+        try:
+            while finished_workers < n_workers:
+                item = out_queue.get()
+                if item is _DONE:
+                    finished_workers += 1
+                    continue
+                pending[item[0]] = item
+                while next_index in pending:
+                    _, name, result = pending.pop(next_index)
+                    next_index += 1
+                    if result is None:
+                        stats['failed'] += 1
+                        continue
+                    sink.write(name, result)
+                    stats['frames'] += 1
+
+                now = time.perf_counter()
+                if now - last_report >= report_interval:
+                    print(f"  {stats['frames']} frames, {stats['frames'] / (now - start):.1f} fps")
+                    last_report = now
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            # 残りを読み捨てて上流スレッドを解放
+            while finished_workers < n_workers:
+                if out_queue.get() is _DONE:
+                    finished_workers += 1
+        finally:
+            sink.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=reader, name="reader")]
+    threads += [threading.Thread(target=worker, name=f"worker-{i}") for i in range(n_workers)]
+    threads.append(threading.Thread(target=writer, name="writer"))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+
+    stats['elapsed'] = elapsed
+    stats['fps'] = stats['frames'] / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Undistort an image directory or video file with a saved calibration")
+    parser.add_argument("calibration", help="opencv_calibration.npz")
+    parser.add_argument("input", help="input image directory or video file")
+    parser.add_argument("output", help="output directory (images) or video file")
+    parser.add_argument("--alpha", type=float, default=1.0, help="0 = valid pixels only, 1 = keep all pixels")
+    parser.add_argument("--crop", action="store_true", help="crop to the valid ROI")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--cache-dir", default=None, help="directory for cached remap tables")
+    parser.add_argument("--ext", default=None, help="output image extension, e.g. .png")
+    parser.add_argument("--fourcc", default="mp4v", help="output video codec")
+    args = parser.parse_args()
+
+    undistorter = Undistorter.from_npz(args.calibration, alpha=args.alpha, cache_dir=args.cache_dir)
+
+    input_path = Path(args.input)
+    if input_path.is_dir():
+        frames = iter_image_frames(input_path)
+        sink = ImageDirectoryWriter(args.output, args.ext)
+    else:
+        cap = cv2.VideoCapture(str(input_path))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+        frames = iter_video_frames(input_path)
+        sink = VideoFileWriter(args.output, fps, args.fourcc)
+
+    print(f"Undistorting {input_path} -> {args.output} ({args.workers} workers)")
+    stats = run_pipeline(frames, undistorter, sink, n_workers=args.workers,
+                         queue_size=args.queue_size, crop=args.crop)
+
+    print(f"✓ {stats['frames']} frames in {stats['elapsed']:.2f}s ({stats['fps']:.1f} fps)")
+    if stats['failed']:
+        print(f"✗ {stats['failed']} frames failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,71 @@ import cv2 as cv
 import numpy as np
 
 
-def find_chessboard_corner(chessboard_path: Path, board_size=(9, 9)):
+def _grid_irregularity(corners, board_size):
+    """Largest second difference along board rows/columns relative to the local square spacing."""
+    grid = corners.reshape(board_size[1], board_size[0], 2)
+    worst = 0.0
+    for axis in (0, 1):
+        lines = np.moveaxis(grid, axis, 0)
+        if len(lines) < 3:
+            continue
+        bend = np.linalg.norm(lines[:-2] - 2 * lines[1:-1] + lines[2:], axis=-1)
+        spacing = np.linalg.norm(lines[1:] - lines[:-1], axis=-1)
+        worst = max(worst, float((bend / np.maximum(np.minimum(spacing[:-1], spacing[1:]), 1e-6)).max()))
+    return worst
+
+
+def find_corners_pyramid(gray, board_size, flags=cv.CALIB_CB_ADAPTIVE_THRESH + cv.CALIB_CB_NORMALIZE_IMAGE,
+                         criteria=(cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001),
+                         win_size=(11, 11), max_dim=1024, max_irregularity=0.25):
+    """
+    Coarse-to-fine chessboard detection for high-resolution images.
+
+    The image is halved with pyrDown until its longer side is at most max_dim
+    pixels and the board is searched there (with CALIB_CB_FAST_CHECK, so
+    images without a board are rejected cheaply). The corners are then
+    carried down the pyramid and refined with cornerSubPix at every level
+    and finally at full resolution.
+
+    On blurry images the coarse detector can misplace single corners. If the
+    refined grid is not smooth (see max_irregularity), detection is repeated
+    at full resolution.
+
+    Returns:
+    - (found, corners) like cv.findChessboardCorners, with refined corners
+    """
+    pyramid = [gray]
+    while max(pyramid[-1].shape[:2]) > max_dim:
+        pyramid.append(cv.pyrDown(pyramid[-1]))
+
+    if len(pyramid) > 1:
+        ret, corners = cv.findChessboardCorners(pyramid[-1], board_size, flags | cv.CALIB_CB_FAST_CHECK)
+        if not ret:
+            return False, None
+
+        for level in reversed(pyramid[:-1]):
+            # Map pixel centres to the next finer level
+            corners = (corners + 0.5) * 2 - 0.5
+            window = win_size if level is gray else (5, 5)
+            corners = cv.cornerSubPix(level, corners, window, (-1, -1), criteria)
+
+        if _grid_irregularity(corners, board_size) <= max_irregularity:
+            return True, corners
+
+    ret, corners = cv.findChessboardCorners(gray, board_size, flags)
+    if not ret:
+        return False, None
+    return True, cv.cornerSubPix(gray, corners, win_size, (-1, -1), criteria)
+
+
+def find_chessboard_corner(chessboard_path: Path, board_size=(9, 9), detection_mode="full", show=True,
+                           display_ms=1000):
+    """
+    detection_mode: "full" runs findChessboardCorners on the full image,
+    "pyramid" uses find_corners_pyramid (faster on high-resolution images).
+    show: draw the detected corners in a window for display_ms per image;
+    pass show=False for headless runs (no GUI calls at all).
+    """
     # termination criteria
     criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001)
     
@@ -24,32 +88,154 @@ def find_chessboard_corner(chessboard_path: Path, board_size=(9, 9)):
             gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
         
             # Find the chess board corners
-            ret, corners = cv.findChessboardCorners(gray, board_size, None)
+            if detection_mode == "pyramid":
+                ret, corners2 = find_corners_pyramid(gray, board_size, criteria=criteria)
+            else:
+                ret, corners = cv.findChessboardCorners(gray, board_size, None)
         
             # If found, add object points, image points (after refining them)
             if ret:
                 print(fname)
                 objpoints.append(objp)
         
-                corners2 = cv.cornerSubPix(gray,corners, (11,11), (-1,-1), criteria)
+                if detection_mode != "pyramid":
+                    corners2 = cv.cornerSubPix(gray,corners, (11,11), (-1,-1), criteria)
                 imgpoints.append(corners2)
         
                 # Draw and display the corners
-                cv.drawChessboardCorners(img, board_size, corners2, ret)
-                cv.imshow('img', img)
-                cv.waitKey(1000)
+                if show:
+                    cv.drawChessboardCorners(img, board_size, corners2, ret)
+                    cv.imshow('img', img)
+                    cv.waitKey(display_ms)
             
     ret, mtx, dist, rvecs, tvecs = cv.calibrateCamera(objpoints, imgpoints, gray.shape[::-1], None, None)
     
-    cv.destroyAllWindows()
+    if show:
+        cv.destroyAllWindows()
     
-    mean_error = 0
-    for i in range(len(objpoints)):
-        imgpoints2, _ = cv.projectPoints(objpoints[i], rvecs[i], tvecs[i], mtx, dist)
-        error = cv.norm(imgpoints[i], imgpoints2, cv.NORM_L2)/len(imgpoints2)
-        mean_error += error
+    # Mean over views of ||residuals||_2 / n_corners (same measure as per-view cv.norm(..., NORM_L2) / n)
+    residuals = reprojection_residuals(objpoints, imgpoints, rvecs, tvecs, mtx, dist)
+    mean_error = np.mean(np.sqrt(np.sum(residuals ** 2, axis=(1, 2))) / residuals.shape[1])
     
-    print( "total error: {}".format(mean_error/len(objpoints)) )
+    print( "total error: {}".format(mean_error) )
     
     return ret, mtx, dist, rvecs, tvecs
-    
\ No newline at end of file
+    
+
+def refine_calibration(objpoints, imgpoints, image_size, camera_matrix, dist_coeffs,
+                       flags=cv.CALIB_RATIONAL_MODEL, max_iter=10):
+    """
+    Re-solve a calibration warm-started from an existing camera matrix and distortion.
+
+    Starting from a nearby solution, Levenberg-Marquardt converges in a few
+    iterations, so max_iter can stay well below the cold-start default of 30.
+
+    Returns:
+    - (rms, camera_matrix, dist_coeffs, rvecs, tvecs) as cv.calibrateCamera
+    """
+    criteria = (cv.TERM_CRITERIA_COUNT + cv.TERM_CRITERIA_EPS, max_iter, np.finfo(np.float64).eps)
+    return cv.calibrateCamera(objpoints, imgpoints, image_size,
+                              camera_matrix.copy(), dist_coeffs.copy(),
+                              flags=flags | cv.CALIB_USE_INTRINSIC_GUESS, criteria=criteria)
+
+
+def rodrigues_batch(rvecs):
+    """(N, 3) rotation vectors -> (N, 3, 3) rotation matrices (vectorized cv.Rodrigues)"""
+    rvecs = np.asarray(rvecs, dtype=np.float64).reshape(-1, 3)
+    theta = np.linalg.norm(rvecs, axis=1)
+    small = theta < 1e-12
+    axis = rvecs / np.where(small, 1.0, theta)[:, None]
+    kx, ky, kz = axis.T
+    zero = np.zeros_like(kx)
+    cross = np.stack([zero, -kz, ky, kz, zero, -kx, -ky, kx, zero], axis=1).reshape(-1, 3, 3)
+    cos, sin = np.cos(theta)[:, None, None], np.sin(theta)[:, None, None]
+    R = cos * np.eye(3) + (1 - cos) * axis[:, :, None] * axis[:, None, :] + sin * cross
+    R[small] = np.eye(3)
+    return R
+
+
+def reprojection_residuals(objpoints, imgpoints, rvecs, tvecs, camera_matrix, dist_coeffs):
+    """
+    Reprojection residuals of all views in one pass.
+
+    The board points of every view are moved into camera coordinates with
+    batched rotations and projected with a single cv.projectPoints call, so
+    the full OpenCV distortion model applies. All views must have the same
+    number of corners.
+
+    Returns:
+    - (N_views, N_corners, 2) array of projected minus detected corner positions
+    """
+    objpoints = np.stack([np.asarray(p, dtype=np.float64).reshape(-1, 3) for p in objpoints])
+    imgpoints = np.stack([np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in imgpoints])
+    R = rodrigues_batch(rvecs)
+    t = np.asarray(tvecs, dtype=np.float64).reshape(-1, 1, 3)
+    camera_points = np.einsum('nij,ncj->nci', R, objpoints) + t
+    projected, _ = cv.projectPoints(camera_points.reshape(-1, 3), np.zeros(3), np.zeros(3),
+                                    np.asarray(camera_matrix, dtype=np.float64),
+                                    np.asarray(dist_coeffs, dtype=np.float64))
+    return projected.reshape(imgpoints.shape) - imgpoints
+
+
+def reprojection_errors(objpoints, imgpoints, rvecs, tvecs, camera_matrix, dist_coeffs):
+    """
+    Per-corner and per-view reprojection errors.
+
+    Returns:
+    - dict with 'residuals' (N_views, N_corners, 2), 'corner_errors' (N_views, N_corners)
+      Euclidean distances, 'view_rms' (N_views,) and the overall 'rms' in pixels
+    """
+    residuals = reprojection_residuals(objpoints, imgpoints, rvecs, tvecs, camera_matrix, dist_coeffs)
+    squared = np.sum(residuals ** 2, axis=2)
+    return {
+        'residuals': residuals,
+        'corner_errors': np.sqrt(squared),
+        'view_rms': np.sqrt(squared.mean(axis=1)),
+        'rms': float(np.sqrt(squared.mean())),
+    }
+
+
+def reject_outlier_views(objpoints, imgpoints, image_size, camera_matrix, dist_coeffs, rvecs, tvecs,
+                         target_rms=None, min_views=10, max_drop=None, drop_fraction=0.1,
+                         flags=cv.CALIB_RATIONAL_MODEL, max_iter=10):
+    """
+    Drop the views with the largest reprojection error and re-solve until a target is met.
+
+    Each round removes the worst drop_fraction of the remaining views (at least
+    one) and re-solves with refine_calibration, warm-started from the previous
+    solution. Stops when the RMS is at or below target_rms, when min_views
+    views remain, or after max_drop views have been removed in total.
+
+    Returns:
+    - (kept, solution, history): indices of the kept views, the final
+      (rms, camera_matrix, dist_coeffs, rvecs, tvecs) and one dict per round
+      with the view count, RMS and dropped indices
+    """
+    kept = np.arange(len(objpoints))
+    max_drop = len(kept) if max_drop is None else max_drop
+    solution = (None, camera_matrix, dist_coeffs, rvecs, tvecs)
+    history = []
+
+    while True:
+        _, camera_matrix, dist_coeffs, rvecs, tvecs = solution
+        errors = reprojection_errors([objpoints[i] for i in kept], [imgpoints[i] for i in kept],
+                                     rvecs, tvecs, camera_matrix, dist_coeffs)
+        solution = (errors['rms'], camera_matrix, dist_coeffs, rvecs, tvecs)
+        if history:
+            history[-1]['rms'] = errors['rms']
+        else:
+            history.append({'views': len(kept), 'rms': errors['rms'], 'dropped': []})
+
+        budget = min(len(kept) - min_views, max_drop - (len(objpoints) - len(kept)))
+        if (target_rms is not None and errors['rms'] <= target_rms) or budget <= 0:
+            break
+
+        n_drop = min(budget, max(1, int(len(kept) * drop_fraction)))
+        worst = np.argsort(errors['view_rms'])[::-1][:n_drop]
+        history.append({'views': len(kept) - n_drop, 'rms': None,
+                        'dropped': sorted(int(i) for i in kept[worst])})
+        kept = np.delete(kept, worst)
+        solution = refine_calibration([objpoints[i] for i in kept], [imgpoints[i] for i in kept], image_size,
+                                      camera_matrix, dist_coeffs, flags=flags, max_iter=max_iter)
+
+    return kept.tolist(), solution, history
@@ -0,0 +1,136 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Arrays stored as plain .npy files (no pickling); everything else goes to index.json
+_ARRAYS = ('board', 'corners', 'rvecs', 'tvecs', 'camera_matrix', 'dist_coeffs')
+
+
+class CalibrationStore:
+    """
+    Calibration dataset stored as a directory of .npy files plus a JSON index.
+
+    Layout:
+    - board.npy: (N_corners, 3) float32 board model, stored once
+    - corners.npy: (N_views, N_corners, 2) float32 detected corners
+    - rvecs.npy, tvecs.npy: (N_views, 3) float64 view poses (optional)
+    - camera_matrix.npy, dist_coeffs.npy: intrinsics (optional)
+    - index.json: image paths (one per view), image size, board settings, RMS error and
+      free-form metadata (e.g. how a synthetic dataset was generated)
+
+    With mmap_mode='r' the arrays are memory-mapped, so opening a large
+    store only reads the index and the .npy headers.
+    """
+
+    def __init__(self, path, board, corners, image_files, image_size, checkerboard_size, square_size,
+                 camera_matrix=None, dist_coeffs=None, rvecs=None, tvecs=None, rms_error=None, metadata=None):
+        self.path = Path(path)
+        self.board = board
+        self.corners = corners
+        self.image_files = list(image_files)
+        self.image_size = tuple(image_size)
+        self.checkerboard_size = tuple(checkerboard_size)
+        self.square_size = square_size
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.rvecs = rvecs
+        self.tvecs = tvecs
+        self.rms_error = rms_error
+        self.metadata = dict(metadata or {})
+
+    def __len__(self):
+        return len(self.corners)
+
+    @staticmethod
+    def exists(path):
+        return (Path(path) / 'index.json').exists()
+
+    @classmethod
+    def save(cls, path, board, image_points, image_files, image_size, checkerboard_size, square_size,
+             camera_matrix=None, dist_coeffs=None, rvecs=None, tvecs=None, rms_error=None, metadata=None):
+        """
+        Write a store from per-view corner arrays (as passed to cv2.calibrateCamera).
+
+        metadata: JSON-serializable dict stored in the index
+
+        The index is written last, so an interrupted save leaves the previous
+        index (or none) rather than one pointing at partially written arrays.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        board = np.ascontiguousarray(np.asarray(board, dtype=np.float32).reshape(-1, 3))
+        corners = np.empty((len(image_points), len(board), 2), dtype=np.float32)
+        for i, points in enumerate(image_points):
+            corners[i] = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        arrays = {
+            'board': board,
+            'corners': corners,
+            'rvecs': np.asarray(rvecs, dtype=np.float64).reshape(-1, 3) if rvecs is not None else None,
+            'tvecs': np.asarray(tvecs, dtype=np.float64).reshape(-1, 3) if tvecs is not None else None,
+            'camera_matrix': np.asarray(camera_matrix, dtype=np.float64) if camera_matrix is not None else None,
+            'dist_coeffs': np.asarray(dist_coeffs, dtype=np.float64) if dist_coeffs is not None else None,
+        }
+        for name in _ARRAYS:
+            if arrays[name] is None:
+                continue
+            tmp_path = path / f"{name}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, arrays[name], allow_pickle=False)
+            os.replace(tmp_path, path / f"{name}.npy")
+
+        index = {
+            'format_version': FORMAT_VERSION,
+            'num_views': len(corners),
+            'num_corners': len(board),
+            'image_files': [str(f) for f in image_files],
+            'image_size': [int(v) for v in image_size],
+            'checkerboard_size': [int(v) for v in checkerboard_size],
+            'square_size': float(square_size),
+            'rms_error': float(rms_error) if rms_error is not None else None,
+            'arrays': [name for name in _ARRAYS if arrays[name] is not None],
+            'metadata': dict(metadata or {}),
+        }
+        tmp_path = path / f"index.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, path / 'index.json')
+        return cls.load(path, mmap_mode=None)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Open a store; with mmap_mode='r' the arrays are read-only memory maps"""
+        path = Path(path)
+        with open(path / 'index.json', 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported calibration store version: {index.get('format_version')}")
+
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in index['arrays']}
+        corners = arrays['corners']
+        if corners.shape != (index['num_views'], index['num_corners'], 2) or len(index['image_files']) != len(corners):
+            raise ValueError(f"Calibration store {path} is inconsistent with its index")
+        return cls(path, arrays['board'], corners, index['image_files'], index['image_size'],
+                   index['checkerboard_size'], index['square_size'],
+                   camera_matrix=arrays.get('camera_matrix'), dist_coeffs=arrays.get('dist_coeffs'),
+                   rvecs=arrays.get('rvecs'), tvecs=arrays.get('tvecs'), rms_error=index['rms_error'],
+                   metadata=index.get('metadata'))
+
+    def object_points(self):
+        """Per-view board points for cv2.calibrateCamera (the same array for every view)"""
+        return [self.board] * len(self)
+
+    def image_points(self):
+        """Per-view (N_corners, 1, 2) corner views into the store (no copies)"""
+        return [view.reshape(-1, 1, 2) for view in self.corners]
+
+    def poses(self):
+        """(rvecs, tvecs) as tuples of (3, 1) arrays, like cv2.calibrateCamera returns them"""
+        if self.rvecs is None or self.tvecs is None:
+            return None, None
+        return (tuple(r.reshape(3, 1) for r in self.rvecs),
+                tuple(t.reshape(3, 1) for t in self.tvecs))
@@ -1,37 +1,187 @@
+import argparse
+import struct
+import zlib
+from pathlib import Path
+
 import numpy as np
 from PIL import Image
 
+# Paper sizes (width, height) in millimetres, portrait
+PAPER_SIZES_MM = {
+    "A0": (841, 1189), "A1": (594, 841), "A2": (420, 594), "A3": (297, 420), "A4": (210, 297),
+    "letter": (215.9, 279.4),
+}
+
+LOSSLESS_FORMATS = {".png": "PNG", ".tif": "TIFF", ".tiff": "TIFF"}
+
 
-def create_checkerboard(size=8, square_size=50):
+def mm_to_px(mm, dpi):
+    """Length in millimetres -> whole pixels at the given print resolution."""
+    return int(round(mm / 25.4 * dpi))
+
+
+def checkerboard_array(cols=8, rows=None, square_size=50, margin=0):
+    """
+    Checkerboard pattern as a uint8 array (255 = white, 0 = black).
+
+    Parameters:
+    - cols, rows: number of squares (rows defaults to cols); the board has (cols-1)x(rows-1) inner corners
+    - square_size: pixel size of each square
+    - margin: white border in pixels around the board
+
+    The top-left square is white. The pattern is built with np.kron from a
+    (rows, cols) parity grid, so a 600 dpi A0 target takes one allocation.
+    """
+    rows = cols if rows is None else rows
+    parity = (np.add.outer(np.arange(rows), np.arange(cols)) % 2 == 0).astype(np.uint8) * 255
+    board = np.kron(parity, np.ones((square_size, square_size), dtype=np.uint8))
+    if margin:
+        board = np.pad(board, margin, constant_values=255)
+    return board
+
+
+def create_checkerboard(size=8, square_size=50, rows=None, margin=0):
     """
     Create a black and white checkerboard pattern.
-    
+
     Parameters:
-    - size: Number of squares in each dimension (default: 8 for 8x8 checkerboard)
+    - size: Number of squares in each dimension (default: 8 for 8x8 checkerboard),
+      or the number of columns when rows is given
     - square_size: Pixel size of each square (default: 50)
-    
+    - rows: Number of square rows for rectangular boards (default: size)
+    - margin: White border in pixels
+
     Returns:
     - Image object with checkerboard pattern
     """
-    # Create an empty array
-    board_size = size * square_size
-    board = np.zeros((board_size, board_size), dtype=np.uint8)
-    
-    # Fill the checkerboard pattern
-    for i in range(size):
-        for j in range(size):
-            if (i + j) % 2 == 0:
-                # White square (255)
-                board[i*square_size:(i+1)*square_size, j*square_size:(j+1)*square_size] = 255
-                
-    # Convert numpy array to PIL Image
-    img = Image.fromarray(board)
-    return img
-
-# Create an 8x8 checkerboard with 50px squares
-checkerboard = create_checkerboard(8, 50)
-
-# Save as JPEG
-checkerboard.save("checkerboard.jpg")
-
-print("Checkerboard image saved as 'checkerboard.jpg'")
\ No newline at end of file
+    return Image.fromarray(checkerboard_array(size, rows, square_size, margin))
+
+
+def create_charuco_board(cols=8, rows=None, square_size=100, marker_ratio=0.7, dictionary="DICT_4X4_50",
+                         margin=0):
+    """
+    ChArUco target: a checkerboard with ArUco markers in the white squares (needs cv2.aruco).
+
+    Returns:
+    - Image object; detect it with cv2.aruco.CharucoDetector using the same
+      (cols, rows), marker_ratio and dictionary
+    """
+    import cv2
+
+    if not hasattr(cv2, "aruco") or not hasattr(cv2.aruco, "CharucoBoard"):
+        raise ImportError("ChArUco boards need OpenCV >= 4.7 with the aruco module")
+    rows = cols if rows is None else rows
+    aruco_dict = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dictionary))
+    board = cv2.aruco.CharucoBoard((cols, rows), 1.0, marker_ratio, aruco_dict)
+    size = (cols * square_size + 2 * margin, rows * square_size + 2 * margin)
+    return Image.fromarray(board.generateImage(size, marginSize=margin, borderBits=1))
+
+
+def save_board(image, path, dpi=None):
+    """
+    Save a board losslessly (PNG or TIFF, chosen by the file extension).
+
+    dpi is stored in the file so that printing at 100% scale gives the
+    intended square size.
+    """
+    path = Path(path)
+    image_format = LOSSLESS_FORMATS.get(path.suffix.lower())
+    if image_format is None:
+        raise ValueError(f"Use a lossless format ({', '.join(LOSSLESS_FORMATS)}); lossy formats blur square edges")
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    options = {"dpi": (dpi, dpi)} if dpi else {}
+    if image_format == "TIFF":
+        options["compression"] = "tiff_lzw"
+    image.save(path, format=image_format, **options)
+
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def write_checkerboard_png(path, cols=8, rows=None, square_size=50, margin=0, dpi=None, strip_rows=1024):
+    """
+    Stream a checkerboard into an 8-bit grayscale PNG strip by strip.
+
+    Only strip_rows pixel rows are held in memory at a time, so print targets
+    larger than RAM (e.g. 600 dpi A0 is about 20k x 28k pixels) can be written.
+    The image (pixels, size and dpi) is identical to save_board(create_checkerboard(...));
+    the compressed bytes differ because PIL picks scanline filters adaptively.
+    """
+    rows = cols if rows is None else rows
+    width = cols * square_size + 2 * margin
+    height = rows * square_size + 2 * margin
+    # Square column index per pixel column (-1 in the margins)
+    x = np.arange(width) - margin
+    col_index = np.where((x >= 0) & (x < cols * square_size), x // square_size, -1)
+
+    compressor = zlib.compressobj(6)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)))
+        if dpi:
+            ppm = int(round(dpi / 0.0254))
+            f.write(_png_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1)))
+        for top in range(0, height, strip_rows):
+            y = np.arange(top, min(top + strip_rows, height)) - margin
+            row_index = np.where((y >= 0) & (y < rows * square_size), y // square_size, -1)
+            inside = (row_index[:, None] >= 0) & (col_index[None, :] >= 0)
+            black = inside & ((row_index[:, None] + col_index[None, :]) % 2 == 1)
+            strip = np.where(black, 0, 255).astype(np.uint8)
+            # Each scanline starts with filter type 0 (None)
+            scanlines = np.hstack([np.zeros((len(strip), 1), np.uint8), strip])
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                f.write(_png_chunk(b"IDAT", data))
+        f.write(_png_chunk(b"IDAT", compressor.flush()))
+        f.write(_png_chunk(b"IEND", b""))
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a printable calibration target")
+    parser.add_argument("--cols", type=int, default=8, help="number of square columns")
+    parser.add_argument("--rows", type=int, default=None, help="number of square rows (default: cols)")
+    parser.add_argument("--square-px", type=int, default=50, help="square size in pixels")
+    parser.add_argument("--square-mm", type=float, default=None, help="square size in mm (uses --dpi)")
+    parser.add_argument("--paper", choices=list(PAPER_SIZES_MM), default=None,
+                        help="fit the largest square size for this paper at --dpi")
+    parser.add_argument("--dpi", type=int, default=None, help="print resolution stored in the file")
+    parser.add_argument("--margin-mm", type=float, default=0.0, help="white border (needs --dpi)")
+    parser.add_argument("--margin-px", type=int, default=0, help="white border in pixels")
+    parser.add_argument("--charuco", action="store_true", help="generate a ChArUco board")
+    parser.add_argument("--tiled", action="store_true", help="stream the PNG in strips (bounded memory)")
+    parser.add_argument("--output", default="checkerboard.png", help=".png or .tif/.tiff")
+    args = parser.parse_args()
+
+    if not args.dpi and (args.square_mm or args.margin_mm or args.paper):
+        parser.error("--square-mm, --margin-mm and --paper need --dpi")
+    if args.tiled and args.charuco:
+        parser.error("--tiled only writes plain checkerboards")
+    if args.tiled and Path(args.output).suffix.lower() != ".png":
+        parser.error("--tiled writes PNG; use an --output ending in .png")
+
+    rows = args.rows or args.cols
+    margin = mm_to_px(args.margin_mm, args.dpi) if args.margin_mm else args.margin_px
+    square = args.square_px
+    if args.square_mm:
+        square = mm_to_px(args.square_mm, args.dpi)
+    elif args.paper:
+        paper_w, paper_h = (mm_to_px(v, args.dpi) for v in PAPER_SIZES_MM[args.paper])
+        square = min((paper_w - 2 * margin) // args.cols, (paper_h - 2 * margin) // rows)
+
+    if args.tiled:
+        width, height = write_checkerboard_png(args.output, args.cols, rows, square, margin, dpi=args.dpi)
+    else:
+        if args.charuco:
+            image = create_charuco_board(args.cols, rows, square, margin=margin)
+        else:
+            image = create_checkerboard(args.cols, square, rows=rows, margin=margin)
+        save_board(image, args.output, dpi=args.dpi)
+        width, height = image.size
+    print(f"Checkerboard image saved as '{args.output}' ({width}x{height} px, {square} px squares)")
+
+
+if __name__ == "__main__":
+    main()
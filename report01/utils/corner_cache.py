@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+class CornerCache:
+    """
+    On-disk cache of chessboard corner detections.
+
+    Each entry is keyed by the image file content plus the detection settings,
+    so renamed files still hit and changed files or settings miss.
+    "No corners found" results are cached as well.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_file, **settings):
+        """Return the cache key for an image file and detection settings, or None if unreadable."""
+        digest = hashlib.blake2b(digest_size=20)
+        try:
+            with open(image_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.npz"
+
+    def get(self, key):
+        """
+        Look up a cached detection.
+
+        Returns:
+        - dict with 'image_size' and 'corners' (None when no board was found), or None on a miss
+        """
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                corners = data['corners'] if bool(data['found']) else None
+                return {'image_size': tuple(int(v) for v in data['image_size']), 'corners': corners}
+        except (OSError, ValueError, KeyError):
+            # Broken entry (e.g. interrupted write); treat as a miss
+            return None
+
+    def put(self, key, image_size, corners):
+        """Store a detection result; corners=None records that no board was found."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f,
+                     found=corners is not None,
+                     image_size=np.asarray(image_size, dtype=np.int32),
+                     corners=corners if corners is not None else np.zeros((0, 1, 2), np.float32))
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        """Remove all cached entries."""
+        for path in self.cache_dir.glob('*.npz'):
+            path.unlink()
@@ -0,0 +1,261 @@
+import threading
+import time
+from pathlib import Path
+
+import cv2 as cv
+import numpy as np
+
+from utils.calibrate import find_corners_pyramid, refine_calibration
+from utils.view_selection import coverage_masks, pose_features
+
+
+class LiveCalibrator:
+    """
+    Chessboard detection and calibration running beside a capture loop.
+
+    submit() hands frames to a detection thread through a one-slot mailbox,
+    so the capture/display loop never waits for detection (with block=False
+    a frame arriving while the worker is busy replaces the pending one).
+    A detected view is kept only if it covers new cells of the image grid
+    or differs enough in board pose from every kept view. Whenever
+    resolve_every new views have been kept, a solver thread re-runs the
+    calibration (warm-started from the previous solution), so a current
+    calibration is available as soon as capture ends.
+    """
+
+    def __init__(self, board_size, square_size=20.0, grid=16, min_new_cells=2, min_pose_dist=0.1,
+                 detection_max_dim=640, resolve_every=5, min_views=8, flags=cv.CALIB_RATIONAL_MODEL,
+                 on_view=None):
+        """
+        Parameters:
+        - board_size: (cols, rows) inner corners
+        - min_new_cells / min_pose_dist: novelty needed to keep a view (see utils.view_selection)
+        - detection_max_dim: longer side of the image the board is searched in (find_corners_pyramid)
+        - resolve_every: re-solve after this many newly kept views
+        - min_views: views needed before the first solve
+        - on_view: callback(index, frame, corners) called on the detection thread for each kept view
+        """
+        self.board_size = tuple(board_size)
+        self.square_size = square_size
+        self.grid = grid
+        self.min_new_cells = min_new_cells
+        self.min_pose_dist = min_pose_dist
+        self.detection_max_dim = detection_max_dim
+        self.resolve_every = resolve_every
+        self.min_views = min_views
+        self.flags = flags
+        self.on_view = on_view
+
+        self.objp = np.zeros((board_size[0] * board_size[1], 3), np.float32)
+        self.objp[:, :2] = np.mgrid[0:board_size[0], 0:board_size[1]].T.reshape(-1, 2)
+        self.objp *= square_size
+
+        self.image_size = None
+        self.image_points = []
+        self.frame_indices = []
+        self._features = np.zeros((0, 7))
+        self._covered = np.zeros(grid * grid, dtype=bool)
+        self.calibration = None  # (rms, camera_matrix, dist_coeffs, rvecs, tvecs)
+        self.stats = {'frames_submitted': 0, 'frames_dropped': 0, 'frames_detected': 0,
+                      'views_kept': 0, 'solves': 0, 'detection_errors': 0, 'solve_errors': 0}
+        self.error = None  # first exception raised while processing a frame or solving
+        self.last_corners = None
+
+        self._lock = threading.Lock()
+        self._mailbox = None
+        self._has_frame = threading.Condition(self._lock)
+        self._solve_needed = threading.Event()
+        self._stopping = False
+        self._detector_done = False
+        self._views_at_last_solve = 0
+        self._detector = threading.Thread(target=self._detect_loop, name="live-detect", daemon=True)
+        self._solver = threading.Thread(target=self._solve_loop, name="live-solve", daemon=True)
+        self._detector.start()
+        self._solver.start()
+
+    def submit(self, frame, index=None, block=False):
+        """
+        Queue a BGR or grayscale frame for detection.
+
+        block=False replaces a frame the worker has not picked up yet (live
+        cameras); block=True waits for the slot instead (video files and
+        image sequences, where every frame should be examined).
+        Raises RuntimeError if the detection thread has stopped.
+        """
+        with self._has_frame:
+            if self._detector_done:
+                raise RuntimeError("Detection thread has stopped") from self.error
+            index = self.stats['frames_submitted'] if index is None else index
+            self.stats['frames_submitted'] += 1
+            if self._mailbox is not None:
+                if block:
+                    self._has_frame.wait_for(lambda: self._mailbox is None or self._stopping
+                                             or self._detector_done)
+                else:
+                    self.stats['frames_dropped'] += 1
+            self._mailbox = (index, frame)
+            self._has_frame.notify_all()
+
+    def _detect_loop(self):
+        try:
+            while True:
+                with self._has_frame:
+                    self._has_frame.wait_for(lambda: self._mailbox is not None or self._stopping)
+                    if self._mailbox is None:
+                        return
+                    index, frame = self._mailbox
+                    self._mailbox = None
+                    self._has_frame.notify_all()
+                try:
+                    self._process(index, frame)
+                except Exception as e:
+                    # A bad frame or a failing on_view callback must not stop detection
+                    self._record_error('detection_errors', e)
+        finally:
+            # Wake submit()/finish() even if the loop ends unexpectedly
+            with self._has_frame:
+                self._detector_done = True
+                self._has_frame.notify_all()
+
+    def _record_error(self, counter, error):
+        with self._lock:
+            self.stats[counter] += 1
+            if self.error is None:
+                self.error = error
+
+    def _process(self, index, frame):
+        gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        found, corners = find_corners_pyramid(gray, self.board_size, max_dim=self.detection_max_dim)
+        with self._lock:
+            self.last_corners = corners if found else None
+            if not found:
+                return
+            self.stats['frames_detected'] += 1
+            if self.image_size is None:
+                self.image_size = gray.shape[::-1]
+            elif self.image_size != gray.shape[::-1]:
+                return
+
+            mask = coverage_masks([corners], self.image_size, self.board_size, self.grid)[0]
+            features = pose_features([corners], self.image_size, self.board_size)
+            new_cells = int((mask & ~self._covered).sum())
+            pose_dist = (np.linalg.norm(self._features - features, axis=1).min()
+                         if len(self._features) else np.inf)
+            if new_cells < self.min_new_cells and pose_dist < self.min_pose_dist:
+                return
+
+            self.image_points.append(corners)
+            self.frame_indices.append(index)
+            self._features = np.vstack([self._features, features])
+            self._covered |= mask
+            self.stats['views_kept'] += 1
+            n_views = len(self.image_points)
+            if n_views >= self.min_views and n_views - self._views_at_last_solve >= self.resolve_every:
+                self._solve_needed.set()
+
+        if self.on_view is not None:
+            self.on_view(index, frame, corners)
+
+    def _solve_loop(self):
+        while True:
+            self._solve_needed.wait()
+            self._solve_needed.clear()
+            if self._stopping:
+                return
+            try:
+                self.solve()
+            except Exception as e:
+                self._record_error('solve_errors', e)
+
+    def solve(self):
+        """Calibrate with the views kept so far (warm start from the last solution); returns the RMS or None"""
+        with self._lock:
+            image_points = list(self.image_points)
+            previous = self.calibration
+        if len(image_points) < max(self.min_views, 3):
+            return None
+
+        object_points = [self.objp] * len(image_points)
+        if previous is None:
+            solution = cv.calibrateCamera(object_points, image_points, self.image_size, None, None,
+                                          flags=self.flags)
+        else:
+            solution = refine_calibration(object_points, image_points, self.image_size,
+                                          previous[1], previous[2], flags=self.flags)
+        with self._lock:
+            self.calibration = solution
+            self._views_at_last_solve = len(image_points)
+            self.stats['solves'] += 1
+        return solution[0]
+
+    @property
+    def coverage(self):
+        return float(self._covered.mean())
+
+    def status(self):
+        """Snapshot of counters, coverage and the current RMS (for an on-screen overlay)"""
+        with self._lock:
+            return {**self.stats, 'coverage': self.coverage,
+                    'rms': self.calibration[0] if self.calibration is not None else None}
+
+    def finish(self):
+        """
+        Process the pending frame, stop the threads and solve once more with all kept views.
+
+        Errors on the worker threads are counted in stats and the first one is kept
+        in self.error; they do not stop the capture.
+        """
+        with self._has_frame:
+            self._has_frame.wait_for(lambda: self._mailbox is None or self._detector_done)
+            self._stopping = True
+            self._has_frame.notify_all()
+        self._detector.join()
+        self._solve_needed.set()
+        self._solver.join()
+        if len(self.image_points) != self._views_at_last_solve:
+            self.solve()
+        return self.calibration
+
+
+def iterate_source(source, fps_limit=None):
+    """
+    Yield (index, frame) from a camera index (int or digit string), a video file or an image directory.
+
+    fps_limit: pace file sources like a live camera (None reads as fast as possible).
+    """
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    if not isinstance(source, int) and Path(source).is_dir():
+        files = sorted(p for p in Path(source).iterdir()
+                       if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))
+        frames = ((i, cv.imread(str(p))) for i, p in enumerate(files))
+    else:
+        frames = _iterate_capture(source)
+
+    interval = 1.0 / fps_limit if fps_limit else 0.0
+    next_time = time.perf_counter()
+    for index, frame in frames:
+        if frame is None:
+            continue
+        if interval:
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_time += interval
+        yield index, frame
+
+
+def _iterate_capture(source):
+    cap = cv.VideoCapture(source if isinstance(source, int) else str(source))
+    if not cap.isOpened():
+        raise OSError(f"Could not open video source: {source}")
+    try:
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, frame
+            index += 1
+    finally:
+        cap.release()
@@ -0,0 +1,163 @@
+import glob
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Stage timers for the pipelines. Disabled by default: span() then returns a
+# shared no-op context manager, so instrumented code pays one function call.
+# report02 loads this same file through its profiling.py shim.
+
+_enabled = False
+_trace_memory = False
+_events = []
+_NULL_SPAN = nullcontext()
+# Peak traced memory of the open spans (innermost last); the tracemalloc peak is
+# reset when a span starts, so each span reports its own peak. tracemalloc keeps
+# one process-wide peak, so only spans on the main thread reset it and report
+# peak_traced_mb: spans opened on other threads (artifact writers, live capture)
+# are timed only, and their allocations count towards the enclosing main span.
+_peak_stack = []
+_process_peak = 0
+
+
+def _reset_after_fork():
+    """A forked worker inherits the parent's buffered events; drop them so its trace part holds only its own"""
+    global _events, _peak_stack, _process_peak
+    _events = []
+    _peak_stack = []
+    _process_peak = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def enable(memory=False):
+    """Start recording spans; memory=True also tracks Python/NumPy allocations with tracemalloc"""
+    global _enabled, _trace_memory
+    _enabled = True
+    _trace_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled, _trace_memory
+    _enabled = False
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _trace_memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def is_tracing_memory():
+    return _enabled and _trace_memory
+
+
+def span(name, category="stage", **args):
+    """Context manager timing one stage as a Chrome trace "complete" event (no-op when disabled)"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _span(name, category, args)
+
+
+def _start_peak():
+    global _process_peak
+    peak = tracemalloc.get_traced_memory()[1]
+    _process_peak = max(_process_peak, peak)
+    if _peak_stack:
+        _peak_stack[-1] = max(_peak_stack[-1], peak)
+    _peak_stack.append(0)
+    tracemalloc.reset_peak()
+
+
+def _end_peak():
+    """Peak traced memory since the matching _start_peak(), carried over to the enclosing span"""
+    global _process_peak
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(_peak_stack.pop() if _peak_stack else 0, peak)
+    _process_peak = max(_process_peak, peak)
+    if _peak_stack:
+        _peak_stack[-1] = max(_peak_stack[-1], peak)
+    return current, peak
+
+
+@contextmanager
+def _span(name, category, args):
+    track_memory = (_trace_memory and tracemalloc.is_tracing()
+                    and threading.current_thread() is threading.main_thread())
+    if track_memory:
+        _start_peak()
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        event = {"name": name, "cat": category, "ph": "X", "ts": start / 1000, "dur": (end - start) / 1000,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if track_memory and tracemalloc.is_tracing():
+            current, peak = _end_peak()
+            args = {**args, "peak_traced_mb": peak / 2**20}
+            _events.append({"name": "traced memory", "ph": "C", "ts": end / 1000, "pid": os.getpid(),
+                            "args": {"current_mb": current / 2**20, "peak_mb": peak / 2**20}})
+        if args:
+            event["args"] = args
+        _events.append(event)
+
+
+def collect():
+    """Return and clear the events recorded in this process"""
+    global _events
+    events, _events = _events, []
+    return events
+
+
+def summary(events=None):
+    """Total time (s) and call count per span name"""
+    totals = {}
+    for event in _events if events is None else events:
+        if event["ph"] == "X":
+            total = totals.setdefault(event["name"], {"count": 0, "total_s": 0.0})
+            total["count"] += 1
+            total["total_s"] += event["dur"] / 1e6
+    return totals
+
+
+def save_part(trace_path):
+    """Write this process's events next to trace_path for export_chrome_trace() in the parent to merge"""
+    events = collect()
+    if events:
+        with open(f"{trace_path}.{os.getpid()}.part", 'w', encoding='utf-8') as f:
+            json.dump(events, f)
+
+
+def export_chrome_trace(trace_path, metadata=None):
+    """
+    Write all recorded events (plus parts saved by worker processes) as Chrome trace-event JSON.
+
+    The file opens in Perfetto (ui.perfetto.dev) or chrome://tracing.
+    """
+    events = collect()
+    for part in glob.glob(f"{glob.escape(str(trace_path))}.*.part"):
+        with open(part, 'r', encoding='utf-8') as f:
+            events.extend(json.load(f))
+        os.remove(part)
+
+    main_pid = os.getpid()
+    for pid in sorted({event["pid"] for event in events}):
+        events.append({"name": "process_name", "ph": "M", "pid": pid,
+                       "args": {"name": "main" if pid == main_pid else f"worker {pid}"}})
+    other_data = dict(metadata or {})
+    if tracemalloc.is_tracing():
+        other_data["peak_traced_mb"] = max(_process_peak, tracemalloc.get_traced_memory()[1]) / 2**20
+
+    os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": other_data}, f)
+    return summary(events)
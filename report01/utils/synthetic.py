@@ -0,0 +1,276 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2 as cv
+import numpy as np
+
+from utils.calibration_store import CalibrationStore
+from utils.checker_board import checkerboard_array
+
+# Ground-truth distortion (k1, k2, p1, p2, k3): moderate barrel distortion like a webcam lens
+DEFAULT_DIST_COEFFS = np.array([-0.25, 0.08, 0.0008, -0.0006, -0.01])
+
+_UNDISTORT_CRITERIA = (cv.TERM_CRITERIA_COUNT + cv.TERM_CRITERIA_EPS, 20, 1e-9)
+
+
+def _undistort_points(pixels, camera_matrix, dist_coeffs):
+    """Normalized image coordinates of distorted pixels, iterated to _UNDISTORT_CRITERIA"""
+    if hasattr(cv, "undistortPointsIter"):
+        return cv.undistortPointsIter(pixels, camera_matrix, dist_coeffs, None, None, _UNDISTORT_CRITERIA)
+    # OpenCV 5 folded undistortPointsIter into undistortPoints
+    return cv.undistortPoints(pixels, camera_matrix, dist_coeffs, criteria=_UNDISTORT_CRITERIA)
+
+
+def default_camera_matrix(image_size, fov_deg=60.0):
+    """Pinhole camera matrix with the given horizontal field of view and a slightly off-centre principal point"""
+    width, height = image_size
+    focal = 0.5 * width / np.tan(np.radians(fov_deg) / 2)
+    return np.array([[focal, 0.0, (width - 1) / 2 + 0.01 * width],
+                     [0.0, focal, (height - 1) / 2 - 0.01 * height],
+                     [0.0, 0.0, 1.0]])
+
+
+class SyntheticRenderer:
+    """
+    Renders a checkerboard seen by a known camera (camera matrix + distortion).
+
+    Every output pixel is undistorted once to its normalized ray (this only
+    depends on the camera); a view is then rendered by intersecting the rays
+    with the board plane and sampling the board texture with cv.remap. The
+    ground-truth corners of the same view come from cv.projectPoints, so
+    the images follow exactly the model cv.calibrateCamera estimates.
+    """
+
+    def __init__(self, board_size=(7, 7), square_size=20.0, image_size=(1280, 960), camera_matrix=None,
+                 dist_coeffs=None, texture_square_px=32, supersample=2):
+        """
+        Parameters:
+        - board_size: (cols, rows) inner corners
+        - square_size: square size in mm (units of the board model and tvecs)
+        - camera_matrix, dist_coeffs: ground truth (default_camera_matrix / DEFAULT_DIST_COEFFS if None)
+        - texture_square_px: resolution of the board texture
+        - supersample: render at this multiple of the image size and downsample with INTER_AREA (anti-aliasing)
+        """
+        self.board_size = tuple(board_size)
+        self.square_size = square_size
+        self.image_size = tuple(image_size)
+        self.camera_matrix = (default_camera_matrix(image_size) if camera_matrix is None
+                              else np.asarray(camera_matrix, dtype=np.float64))
+        self.dist_coeffs = (DEFAULT_DIST_COEFFS.copy() if dist_coeffs is None
+                            else np.asarray(dist_coeffs, dtype=np.float64).ravel())
+        self.supersample = supersample
+
+        cols, rows = self.board_size
+        self.objp = np.zeros((cols * rows, 3), np.float32)
+        self.objp[:, :2] = np.mgrid[0:cols, 0:rows].T.reshape(-1, 2)
+        self.objp *= square_size
+
+        # (cols+1)x(rows+1) squares plus a one-square white border (the detector needs a quiet zone).
+        # Board point (0, 0) is the first inner corner, two squares in from the texture edge.
+        self.texture = checkerboard_array(cols + 1, rows + 1, texture_square_px, margin=texture_square_px)
+        self._texture_scale = texture_square_px / square_size
+        self._texture_origin = 2 * texture_square_px - 0.5
+        # Outline of the printed board (including the border) in board coordinates
+        self._outline = np.array([[-2, -2, 0], [cols + 1, -2, 0], [cols + 1, rows + 1, 0], [-2, rows + 1, 0]],
+                                 dtype=np.float64) * square_size
+
+        width, height = self.image_size
+        u = (np.arange(width * supersample) + 0.5) / supersample - 0.5
+        v = (np.arange(height * supersample) + 0.5) / supersample - 0.5
+        pixels = np.stack(np.meshgrid(u, v), axis=-1).reshape(-1, 1, 2)
+        rays = _undistort_points(pixels, self.camera_matrix, self.dist_coeffs)
+        self._rays = rays.reshape(height * supersample, width * supersample, 2).astype(np.float32)
+
+    def project(self, rvec, tvec, points=None):
+        """Ground-truth image points (N, 1, 2) of the board corners (or of the given board points)"""
+        points = self.objp if points is None else points
+        projected, _ = cv.projectPoints(points, rvec, tvec, self.camera_matrix, self.dist_coeffs)
+        return projected.astype(np.float32)
+
+    def random_pose(self, rng, max_tilt_deg=45.0, max_roll_deg=30.0, fill=(0.3, 0.75), border_px=10,
+                    max_tries=100):
+        """
+        Random board pose with the whole printed board inside the image.
+
+        The board is tilted up to max_tilt_deg about both axes, rotated in plane
+        up to max_roll_deg (small enough that the detector keeps the corner
+        order) and placed so that it spans a random fraction `fill` of the
+        image width.
+
+        Returns:
+        - (rvec, tvec) as (3, 1) float64 arrays
+        """
+        width, height = self.image_size
+        cols, rows = self.board_size
+        board_width = (cols + 3) * self.square_size
+        centre = np.array([(cols - 1) / 2, (rows - 1) / 2, 0.0]) * self.square_size
+        k_inv = np.linalg.inv(self.camera_matrix)
+
+        for _ in range(max_tries):
+            tilt_x, tilt_y = np.radians(rng.uniform(-max_tilt_deg, max_tilt_deg, 2))
+            roll = np.radians(rng.uniform(-max_roll_deg, max_roll_deg))
+            rotation = (cv.Rodrigues(np.array([0.0, 0.0, roll]))[0]
+                        @ cv.Rodrigues(np.array([tilt_x, 0.0, 0.0]))[0]
+                        @ cv.Rodrigues(np.array([0.0, tilt_y, 0.0]))[0])
+            distance = self.camera_matrix[0, 0] * board_width / (rng.uniform(*fill) * width)
+            target = [rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height, 1.0]
+            tvec = (distance * (k_inv @ target) - rotation @ centre).reshape(3, 1)
+            rvec = cv.Rodrigues(rotation)[0]
+
+            outline = self.project(rvec, tvec, self._outline).reshape(-1, 2)
+            inside = ((outline >= border_px) & (outline < [width - border_px, height - border_px])).all()
+            if inside and (rotation @ self._outline.T + tvec)[2].min() > 0:
+                return rvec, tvec
+        raise RuntimeError(f"No board pose fits the image after {max_tries} tries")
+
+    def render(self, rvec, tvec, black=30, white=220, background=128, blur_sigma=0.0, noise_sigma=0.0, rng=None):
+        """
+        Render one grayscale view (uint8, image_size).
+
+        blur_sigma: Gaussian blur in output pixels (defocus / motion)
+        noise_sigma: additive Gaussian noise in gray levels (needs rng)
+        """
+        rotation = cv.Rodrigues(np.asarray(rvec, dtype=np.float64))[0]
+        homography = np.column_stack([rotation[:, 0], rotation[:, 1], np.asarray(tvec, dtype=np.float64).ravel()])
+        h = np.linalg.inv(homography).astype(np.float32)
+
+        # Ray -> board plane (in mm) -> texture pixel
+        x, y = self._rays[..., 0], self._rays[..., 1]
+        w = h[2, 0] * x + h[2, 1] * y + h[2, 2]
+        # Rays hitting the plane behind the camera (or parallel to it) see the background
+        behind = w <= 1e-6
+        w[behind] = 1.0
+        map_x = self._texture_origin + (h[0, 0] * x + h[0, 1] * y + h[0, 2]) / w * self._texture_scale
+        map_y = self._texture_origin + (h[1, 0] * x + h[1, 1] * y + h[1, 2]) / w * self._texture_scale
+        map_x[behind] = -1
+        map_y[behind] = -1
+
+        texture = (black + (white - black) / 255.0 * self.texture).astype(np.float32)
+        image = cv.remap(texture, map_x, map_y, cv.INTER_LINEAR, borderMode=cv.BORDER_CONSTANT,
+                         borderValue=float(background))
+        if self.supersample > 1:
+            image = cv.resize(image, self.image_size, interpolation=cv.INTER_AREA)
+        if blur_sigma > 0:
+            image = cv.GaussianBlur(image, (0, 0), blur_sigma)
+        if noise_sigma > 0:
+            image += rng.normal(0.0, noise_sigma, image.shape).astype(np.float32)
+        return np.clip(np.round(image), 0, 255).astype(np.uint8)
+
+    def random_view(self, rng, blur=(0.0, 1.5), noise=(0.0, 4.0)):
+        """
+        Random pose, contrast, blur and noise.
+
+        Returns:
+        - (image, rvec, tvec, corners, params) with ground-truth corners (N, 1, 2)
+        """
+        rvec, tvec = self.random_pose(rng)
+        params = {
+            'black': float(rng.uniform(10, 70)),
+            'white': float(rng.uniform(170, 250)),
+            'background': float(rng.uniform(40, 200)),
+            'blur_sigma': float(rng.uniform(*blur)),
+            'noise_sigma': float(rng.uniform(*noise)),
+        }
+        image = self.render(rvec, tvec, rng=rng, **params)
+        return image, rvec, tvec, self.project(rvec, tvec), params
+
+
+_renderer = None
+
+
+def _init_renderer(renderer_args):
+    """Build the renderer once per worker process (the ray map is the expensive part)"""
+    global _renderer
+    cv.setNumThreads(1)
+    _renderer = SyntheticRenderer(**renderer_args)
+
+
+def _render_to_file(index, seed, image_file, blur, noise):
+    # Seeded per view, so the dataset does not depend on the number of workers
+    image, rvec, tvec, corners, params = _renderer.random_view(np.random.default_rng([seed, index]), blur, noise)
+    if not cv.imwrite(str(image_file), image):
+        raise OSError(f"Could not write {image_file}")
+    return rvec, tvec, corners, params
+
+
+def generate_dataset(output_dir, n_views, board_size=(7, 7), square_size=20.0, image_size=(1280, 960),
+                     camera_matrix=None, dist_coeffs=None, seed=0, blur=(0.0, 1.5), noise=(0.0, 4.0),
+                     image_format=".png", n_workers=1):
+    """
+    Write n_views rendered images and their ground truth.
+
+    Layout:
+    - output_dir/images/view_00000.png, ...
+    - output_dir/ground_truth: CalibrationStore with the true corners, poses and intrinsics;
+      its metadata holds the generator settings (dataset_settings())
+    - output_dir/render_params.json: generator settings and per-view contrast, blur and noise
+
+    Returns:
+    - the ground-truth CalibrationStore
+    """
+    output_dir = Path(output_dir)
+    image_dir = output_dir / 'images'
+    image_dir.mkdir(parents=True, exist_ok=True)
+    renderer_args = {'board_size': tuple(board_size), 'square_size': square_size, 'image_size': tuple(image_size),
+                     'camera_matrix': camera_matrix, 'dist_coeffs': dist_coeffs}
+    image_files = [image_dir / f"view_{i:05d}{image_format}" for i in range(n_views)]
+    jobs = (range(n_views), [seed] * n_views, image_files, [blur] * n_views, [noise] * n_views)
+
+    global _renderer
+    renderer = SyntheticRenderer(**renderer_args)
+    if n_workers <= 1:
+        _renderer = renderer
+        views = list(map(_render_to_file, *jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_renderer,
+                                 initargs=(renderer_args,)) as executor:
+            views = list(executor.map(_render_to_file, *jobs, chunksize=16))
+
+    rvecs, tvecs, corners, params = zip(*views)
+    with open(output_dir / 'render_params.json', 'w', encoding='utf-8') as f:
+        json.dump({'seed': seed, 'blur': list(blur), 'noise': list(noise), 'views': list(params)}, f, indent=2)
+    return CalibrationStore.save(output_dir / 'ground_truth', renderer.objp, corners, image_files, image_size,
+                                 board_size, square_size, camera_matrix=renderer.camera_matrix,
+                                 dist_coeffs=renderer.dist_coeffs, rvecs=rvecs, tvecs=tvecs,
+                                 metadata=dataset_settings(seed, blur, noise, image_format))
+
+
+def dataset_settings(seed, blur, noise, image_format=".png"):
+    """Generator settings recorded with a dataset; views are seeded per index, so equal settings give equal images"""
+    return {'generator': 'synthetic', 'seed': int(seed), 'blur': [float(v) for v in blur],
+            'noise': [float(v) for v in noise], 'image_format': image_format}
+
+
+def intrinsics_error(camera_matrix, dist_coeffs, true_camera_matrix, true_dist_coeffs, image_size, step=16):
+    """
+    Distance of estimated intrinsics from the ground truth.
+
+    Distortion coefficients trade off against each other and the focal
+    length, so besides per-parameter errors the whole model is compared:
+    pixels on a grid are undistorted with the true model and re-projected
+    with the estimated one (distortion_mean_px / distortion_max_px).
+    """
+    k, k_true = np.asarray(camera_matrix, dtype=np.float64), np.asarray(true_camera_matrix, dtype=np.float64)
+    width, height = image_size
+    pixels = np.stack(np.meshgrid(np.arange(0, width, step), np.arange(0, height, step)), axis=-1)
+    pixels = pixels.reshape(-1, 1, 2).astype(np.float64)
+    rays = _undistort_points(pixels, k_true, np.asarray(true_dist_coeffs, dtype=np.float64))
+    rays = np.concatenate([rays.reshape(-1, 2), np.ones((len(pixels), 1))], axis=1)
+    reprojected, _ = cv.projectPoints(rays, np.zeros(3), np.zeros(3), k, np.asarray(dist_coeffs, dtype=np.float64))
+    model_error = np.linalg.norm(reprojected.reshape(-1, 2) - pixels.reshape(-1, 2), axis=1)
+    return {
+        'fx_rel_error': float(abs(k[0, 0] - k_true[0, 0]) / k_true[0, 0]),
+        'fy_rel_error': float(abs(k[1, 1] - k_true[1, 1]) / k_true[1, 1]),
+        'cx_error_px': float(abs(k[0, 2] - k_true[0, 2])),
+        'cy_error_px': float(abs(k[1, 2] - k_true[1, 2])),
+        'distortion_mean_px': float(model_error.mean()),
+        'distortion_max_px': float(model_error.max()),
+    }
+
+
+def corner_errors(corners, true_corners):
+    """Per-corner distance (px) of detected corners to the nearest ground-truth corner (order-independent)"""
+    corners = np.asarray(corners, dtype=np.float32).reshape(-1, 2)
+    true_corners = np.asarray(true_corners, dtype=np.float32).reshape(-1, 2)
+    return np.linalg.norm(corners[:, None] - true_corners[None], axis=2).min(axis=1)
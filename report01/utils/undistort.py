@@ -0,0 +1,101 @@
+import hashlib
+import os
+from pathlib import Path
+
+import cv2 as cv
+import numpy as np
+
+
+class Undistorter:
+    """
+    Undistort frames with remap tables computed once per calibration.
+
+    The maps from cv.initUndistortRectifyMap are kept in the compact
+    fixed-point CV_16SC2 form, so each frame costs a single cv.remap.
+    With cache_dir set, maps are stored on disk keyed by the intrinsics,
+    alpha and input/output size and reused by later runs.
+    """
+
+    def __init__(self, camera_matrix, dist_coeffs, image_size, alpha=1.0, output_size=None, cache_dir=None):
+        """
+        Parameters:
+        - camera_matrix, dist_coeffs: calibration results
+        - image_size: (width, height) of the input frames
+        - alpha: free scaling parameter of cv.getOptimalNewCameraMatrix (0 = valid pixels only, 1 = all pixels)
+        - output_size: (width, height) of the undistorted frames (default: image_size)
+        - cache_dir: directory for cached remap tables (None disables the disk cache)
+        """
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64)
+        self.image_size = tuple(int(v) for v in image_size)
+        self.output_size = tuple(int(v) for v in (output_size or image_size))
+        self.alpha = float(alpha)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+
+        if not self._load_cache():
+            self.new_camera_matrix, roi = cv.getOptimalNewCameraMatrix(
+                self.camera_matrix, self.dist_coeffs, self.image_size, self.alpha, self.output_size
+            )
+            self.roi = tuple(int(v) for v in roi)
+            self.map1, self.map2 = cv.initUndistortRectifyMap(
+                self.camera_matrix, self.dist_coeffs, None, self.new_camera_matrix,
+                self.output_size, cv.CV_16SC2
+            )
+            self._save_cache()
+
+    @classmethod
+    def from_npz(cls, calibration_file, **kwargs):
+        """Build an Undistorter from a saved opencv_calibration.npz."""
+        with np.load(calibration_file) as data:
+            return cls(data['camera_matrix'], data['dist_coeffs'], tuple(data['image_size']), **kwargs)
+
+    @property
+    def cache_key(self):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.camera_matrix.tobytes())
+        digest.update(self.dist_coeffs.ravel().tobytes())
+        digest.update(np.array([self.alpha, *self.image_size, *self.output_size], np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _cache_path(self):
+        return self.cache_dir / f"undistort_{self.cache_key}.npz"
+
+    def _load_cache(self):
+        if self.cache_dir is None or not self._cache_path().exists():
+            return False
+        try:
+            with np.load(self._cache_path()) as data:
+                self.map1 = data['map1']
+                self.map2 = data['map2']
+                self.new_camera_matrix = data['new_camera_matrix']
+                self.roi = tuple(int(v) for v in data['roi'])
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def _save_cache(self):
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_path()
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, map1=self.map1, map2=self.map2,
+                     new_camera_matrix=self.new_camera_matrix, roi=np.array(self.roi, np.int32))
+        os.replace(tmp_path, path)
+
+    def undistort(self, img, interpolation=cv.INTER_LINEAR, crop=False, dst=None):
+        """Undistort one frame; crop=True returns only the valid ROI."""
+        if img.shape[1::-1] != self.image_size:
+            raise ValueError(f"Frame size {img.shape[1::-1]} does not match calibration size {self.image_size}")
+        out = cv.remap(img, self.map1, self.map2, interpolation, dst=dst)
+        return self.crop(out) if crop else out
+
+    __call__ = undistort
+
+    def crop(self, img):
+        """Crop an undistorted frame to the valid ROI (no-op if the ROI is empty)."""
+        x, y, w, h = self.roi
+        if w > 0 and h > 0:
+            return img[y:y + h, x:x + w]
+        return img
@@ -0,0 +1,99 @@
+import cv2 as cv
+import numpy as np
+
+
+def _outer_corners(image_points, board_size):
+    """(N_views, 4, 2) outer board corners in grid order: first, end of first row, last, start of last row"""
+    cols, rows = board_size
+    corners = np.stack([np.asarray(points, dtype=np.float32).reshape(-1, 2) for points in image_points])
+    return corners[:, [0, cols - 1, cols * rows - 1, cols * (rows - 1)]]
+
+
+def pose_features(image_points, image_size, board_size):
+    """
+    Per-view board pose descriptor from the detected corners.
+
+    Columns: board centre (x, y as fractions of the image), scale (square root
+    of the board area over the image area), perspective tilt about both board
+    axes (log ratio of opposite edge lengths) and in-plane rotation (cos, sin,
+    down-weighted).
+    """
+    quad = _outer_corners(image_points, board_size).astype(np.float64)
+    width, height = image_size
+    centre = quad.mean(axis=1) / [width, height]
+
+    x, y = quad[..., 0], quad[..., 1]
+    area = 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1))
+    scale = np.sqrt(area / (width * height))
+
+    edges = np.linalg.norm(np.roll(quad, -1, axis=1) - quad, axis=2)  # top, right, bottom, left
+    edges = np.maximum(edges, 1e-6)
+    tilt = np.log(np.stack([edges[:, 0] / edges[:, 2], edges[:, 1] / edges[:, 3]], axis=1))
+
+    row_dir = quad[:, 1] - quad[:, 0]
+    angle = np.arctan2(row_dir[:, 1], row_dir[:, 0])
+    rotation = 0.25 * np.stack([np.cos(angle), np.sin(angle)], axis=1)
+
+    return np.column_stack([centre, scale, tilt, rotation])
+
+
+def coverage_masks(image_points, image_size, board_size, grid=16):
+    """(N_views, grid*grid) boolean masks of the image cells covered by each board's outline"""
+    quad = _outer_corners(image_points, board_size)
+    cell = np.array([image_size[0] / grid, image_size[1] / grid], dtype=np.float32)
+    masks = np.zeros((len(quad), grid, grid), dtype=np.uint8)
+    for mask, outline in zip(masks, quad):
+        hull = cv.convexHull(np.round(outline / cell - 0.5).astype(np.int32))
+        cv.fillConvexPoly(mask, hull, 1)
+    return masks.reshape(len(quad), -1).astype(bool)
+
+
+def select_views(image_points, image_size, board_size, max_views, grid=16, duplicate_dist=0.05,
+                 coverage_weight=1.0):
+    """
+    Pick at most max_views views that cover the image and vary the board pose.
+
+    Views are chosen greedily: start with the view covering the most image
+    cells, then repeatedly take the view maximizing (newly covered cells as a
+    fraction of the grid) * coverage_weight + (pose distance to the nearest
+    selected view). Views closer than duplicate_dist in pose space to a
+    selected view are dropped as near-duplicates.
+
+    Returns:
+    - (indices, report): selected view indices in their original order and a
+      dict with view counts and the covered fraction of the image grid
+    """
+    n_views = len(image_points)
+    report = {'views_total': n_views, 'views_selected': n_views, 'duplicates_dropped': 0,
+              'coverage_all': 0.0, 'coverage_selected': 0.0}
+    if n_views == 0:
+        return [], report
+
+    features = pose_features(image_points, image_size, board_size)
+    masks = coverage_masks(image_points, image_size, board_size, grid)
+    n_cells = masks.shape[1]
+    report['coverage_all'] = float(masks.any(axis=0).sum() / n_cells)
+
+    covered = np.zeros(n_cells, dtype=bool)
+    nearest = np.full(n_views, np.inf)
+    candidates = np.ones(n_views, dtype=bool)
+    selected = []
+    index = int(np.argmax(masks.sum(axis=1)))
+    while True:
+        selected.append(index)
+        candidates[index] = False
+        covered |= masks[index]
+        nearest = np.minimum(nearest, np.linalg.norm(features - features[index], axis=1))
+        duplicates = candidates & (nearest < duplicate_dist)
+        report['duplicates_dropped'] += int(duplicates.sum())
+        candidates &= ~duplicates
+
+        if len(selected) >= max_views or not candidates.any():
+            break
+        gain = coverage_weight * (masks & ~covered).sum(axis=1) / n_cells + nearest
+        gain[~candidates] = -np.inf
+        index = int(np.argmax(gain))
+
+    report['views_selected'] = len(selected)
+    report['coverage_selected'] = float(covered.sum() / n_cells)
+    return sorted(selected), report
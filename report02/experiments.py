@@ -1,42 +1,86 @@
+import argparse
 import csv
 import fnmatch
 import json
+import multiprocessing.util
 import os
+import platform
+import statistics
 import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
 
 import cv2
 import numpy as np
 from tqdm import tqdm
 
+import profiling
+from feature_store import FeatureStore
+from gallery_index import GalleryIndex
+from image_cache import ImageCache
+from matching import (DEFAULT_VERIFICATION, VERIFICATION_METHODS, knn_match_arrays, mutual_filter,
+                      ratio_test, verify_homography)
+from result_stats import ResultAggregator
+from results_log import ResultsLog, combination_key
+from visualization import ArtifactWriter, VisualizationPolicy, render_artifacts
 
-def create_detector(detector_type):
-    """Create feature detector"""
-    detectors = {
-        "SIFT": cv2.SIFT_create(),
-        "ORB": cv2.ORB_create(),
-        "AKAZE": cv2.AKAZE_create(),
-        "KAZE": cv2.KAZE_create(),
-        "BRISK": cv2.BRISK_create()
-    }
-    return detectors[detector_type]
 
+# Detector constructors; instances are built on first request and reused within a process
+DETECTOR_FACTORIES = {
+    "SIFT": cv2.SIFT_create,
+    "ORB": cv2.ORB_create,
+    "AKAZE": cv2.AKAZE_create,
+    "KAZE": cv2.KAZE_create,
+    "BRISK": cv2.BRISK_create
+}
 
-def create_matcher(matcher_type, detector_type):
-    """Create feature matcher"""
+_detector_instances = {}
+_matcher_instances = {}
+
+
+def _params_key(params):
+    return tuple(sorted((params or {}).items()))
+
+
+def create_detector(detector_type, params=None):
+    """
+    Get a feature detector, creating it on first use.
+    
+    params: keyword overrides for the constructor, e.g. {"nfeatures": 5000} for ORB
+    or {"contrastThreshold": 0.03} for SIFT
+    """
+    key = (detector_type, _params_key(params))
+    if key not in _detector_instances:
+        _detector_instances[key] = DETECTOR_FACTORIES[detector_type](**(params or {}))
+    return _detector_instances[key]
+
+
+def matcher_config(matcher_type, detector_type):
+    """Norm type (BF) or FLANN index/search parameters for a matcher/detector combination"""
     if matcher_type == "BF":
         if detector_type in ["ORB", "BRISK"]:
-            return cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+            return {"norm": cv2.NORM_HAMMING}
         else:
-            return cv2.BFMatcher(cv2.NORM_L2, crossCheck=False)
+            return {"norm": cv2.NORM_L2}
     else:  # FLANN
         if detector_type in ["SIFT", "AKAZE", "KAZE"]:
-            index_params = dict(algorithm=1, trees=5)
-            search_params = dict(checks=50)
-            return cv2.FlannBasedMatcher(index_params, search_params)
+            return {"index_params": dict(algorithm=1, trees=5), "search_params": dict(checks=50)}
         else:
-            index_params = dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1)
-            search_params = dict(checks=50)
-            return cv2.FlannBasedMatcher(index_params, search_params)
+            return {"index_params": dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1),
+                    "search_params": dict(checks=50)}
+
+
+def create_matcher(matcher_type, detector_type):
+    """Get a feature matcher, creating it on first use (knnMatch with explicit train descriptors is stateless)"""
+    key = (matcher_type, detector_type)
+    if key not in _matcher_instances:
+        config = matcher_config(matcher_type, detector_type)
+        if matcher_type == "BF":
+            _matcher_instances[key] = cv2.BFMatcher(config["norm"], crossCheck=False)
+        else:
+            _matcher_instances[key] = cv2.FlannBasedMatcher(config["index_params"], config["search_params"])
+    return _matcher_instances[key]
 
 
 def prepare_descriptors(desc1, desc2, matcher_type, detector_type):
@@ -52,124 +96,124 @@ def prepare_descriptors(desc1, desc2, matcher_type, detector_type):
 
 
 def perform_feature_matching(image1_path, image2_path, detector_type="SIFT", 
-                            matcher_type="BF", ratio_thresh=0.75, output_dir=None):
-    """Core feature matching function"""
+                            matcher_type="BF", ratio_thresh=0.75, output_dir=None, feature_store=None,
+                            detector_params=None, cross_check=False, visualization=None,
+                            artifact_writer=None, verification=None, image_cache=None):
+    """
+    Core feature matching function
     
-    # Load images
-    img1_color = cv2.imread(image1_path)
-    img2_color = cv2.imread(image2_path)
-    img1 = cv2.imread(image1_path, cv2.IMREAD_GRAYSCALE)
-    img2 = cv2.imread(image2_path, cv2.IMREAD_GRAYSCALE)
+    verification: overrides for matching.DEFAULT_VERIFICATION (method, reproj_thresh,
+    confidence, max_iters, min_matches)
+    visualization: VisualizationPolicy deciding whether artifacts are written to output_dir (default: all)
+    artifact_writer: ArtifactWriter rendering them in the background (default: render before returning)
+    image_cache: ImageCache supplying decoded images (default: cv2.imread on every use)
+    """
     
-    if img1 is None or img2 is None:
+    # Feature detection (skipped for images already in the feature store)
+    if feature_store is None:
+        feature_store = FeatureStore(max_entries=2)
+    make_detector = partial(create_detector, detector_type, detector_params)
+    load_image = image_cache.gray if image_cache is not None else None
+    features1, cached1 = feature_store.get_or_compute(image1_path, detector_type, make_detector,
+                                                      params=detector_params, load_image=load_image)
+    features2, cached2 = feature_store.get_or_compute(image2_path, detector_type, make_detector,
+                                                      params=detector_params, load_image=load_image)
+    
+    if features1 is None or features2 is None:
         return None
     
-    # Feature detection
-    detector = create_detector(detector_type)
-    start_time = time.time()
-    kp1, des1 = detector.detectAndCompute(img1, None)
-    kp2, des2 = detector.detectAndCompute(img2, None)
-    detection_time = time.time() - start_time
+    detection_time = features1["detection_time"] + features2["detection_time"]
+    features_cached = cached1 and cached2
+    pts1, des1 = features1["pts"], features1["descriptors"]
+    pts2, des2 = features2["pts"], features2["descriptors"]
     
-    if des1 is None or des2 is None or len(kp1) == 0 or len(kp2) == 0:
+    if des1 is None or des2 is None or len(pts1) == 0 or len(pts2) == 0:
         return {
-            "kp1_count": len(kp1) if kp1 else 0,
-            "kp2_count": len(kp2) if kp2 else 0,
+            "kp1_count": len(pts1),
+            "kp2_count": len(pts2),
             "good_matches": 0, "detection_time": detection_time,
             "matching_time": 0, "ransac_time": 0, "inlier_matches": 0,
             "detector": detector_type, "matcher": matcher_type,
-            "match_quality": 0.0, "status": "no_features"
+            "match_quality": 0.0, "status": "no_features", "features_cached": features_cached,
+            "image1_path": image1_path, "image2_path": image2_path
         }
     
-    # Feature matching
+    # Feature matching (kNN as index/distance arrays)
     des1, des2 = prepare_descriptors(des1, des2, matcher_type, detector_type)
-    matcher = create_matcher(matcher_type, detector_type)
+    config = matcher_config(matcher_type, detector_type)
     
-    start_time = time.time()
-    matches = matcher.knnMatch(des1, des2, k=2)
-    matching_time = time.time() - start_time
-    
-    # Ratio test
-    good_matches = []
-    if matches:
-        for match_list in matches:
-            if len(match_list) >= 2:
-                m, n = match_list
-                if m.distance < ratio_thresh * n.distance:
-                    good_matches.append(m)
-    
-    match_quality = len(good_matches) / min(len(kp1), len(kp2)) * 100 if min(len(kp1), len(kp2)) > 0 else 0
-    
-    # Save visualizations
-    if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
-        base_name = os.path.basename(image1_path).split('_')[0]
-        
-        # Keypoints
-        img_kp1 = cv2.drawKeypoints(img1_color, kp1, None, color=(0, 255, 0))
-        img_kp2 = cv2.drawKeypoints(img2_color, kp2, None, color=(0, 255, 0))
-        cv2.imwrite(f"{output_dir}/{base_name}_{detector_type}_kp1.png", img_kp1)
-        cv2.imwrite(f"{output_dir}/{base_name}_{detector_type}_kp2.png", img_kp2)
-        
-        # Matches
-        img_matches = cv2.drawMatches(img1_color, kp1, img2_color, kp2, good_matches, None,
-                                     flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS)
-        cv2.imwrite(f"{output_dir}/{base_name}_{detector_type}_{matcher_type}_matches.png", img_matches)
-    
-    # RANSAC and registration
-    ransac_time = 0
-    inlier_matches = 0
-    registration_success = False
-    
-    if len(good_matches) > 4:
-        src_pts = np.float32([kp1[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-        dst_pts = np.float32([kp2[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-        
-        start_time = time.time()
-        H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
-        ransac_time = time.time() - start_time
-        
-        if mask is not None:
-            inlier_matches = sum(mask.ravel())
-        
-        if H is not None and inlier_matches > 0:
-            registration_success = True
-            if output_dir:
-                img1_warped = cv2.warpPerspective(img1_color, H, (img2.shape[1], img2.shape[0]))
-                gray_warped = cv2.cvtColor(img1_warped, cv2.COLOR_BGR2GRAY)
-                ret, mask_warped = cv2.threshold(gray_warped, 1, 255, cv2.THRESH_BINARY)
-                mask_warped_inv = cv2.bitwise_not(mask_warped)
-                img2_masked = cv2.bitwise_and(img2_color, img2_color, mask=mask_warped_inv)
-                img_registered = cv2.add(img2_masked, img1_warped)
-                cv2.imwrite(f"{output_dir}/{base_name}_{detector_type}_{matcher_type}_registration.png", 
-                           img_registered)
+    with profiling.span("match", matcher=matcher_type):
+        start_time = time.perf_counter_ns()
+        knn_idx, knn_dist = knn_match_arrays(des1, des2, config, k=2)
+        matching_time = (time.perf_counter_ns() - start_time) / 1e9
+    
+    # Ratio test (and optional mutual nearest-neighbour check)
+    with profiling.span("ratio_test"):
+        query_idx, train_idx, match_dist = ratio_test(knn_idx, knn_dist, ratio_thresh)
+        if cross_check:
+            mutual = mutual_filter(query_idx, train_idx, des1, des2, config)
+            query_idx, train_idx, match_dist = query_idx[mutual], train_idx[mutual], match_dist[mutual]
+    num_good = len(query_idx)
+    
+    match_quality = num_good / min(len(pts1), len(pts2)) * 100
+    
+    # Geometric verification (pre-filter + RANSAC/USAC homography)
+    src_pts = pts1[query_idx].reshape(-1, 1, 2)
+    dst_pts = pts2[train_idx].reshape(-1, 1, 2)
+    
+    with profiling.span("ransac"):
+        start_time = time.perf_counter_ns()
+        verified = verify_homography(src_pts, dst_pts, match_dist, verification)
+    ransac_time = (time.perf_counter_ns() - start_time) / 1e9 if not verified["skipped"] else 0
+    
+    H = verified["H"]
+    inlier_matches = verified["inliers"]
+    registration_success = H is not None and inlier_matches > 0
     
     # Status
-    if len(good_matches) == 0:
+    if num_good == 0:
         status = "no_matches"
-    elif len(good_matches) < 4:
+    elif num_good < 4 or verified["skipped"]:
         status = "insufficient_matches"
     elif not registration_success:
         status = "registration_failed"
     else:
         status = "success"
     
+    # Visualizations are rendered outside the timed stages, on the artifact writer's threads
+    base_name = os.path.basename(image1_path).split('_')[0]
+    if output_dir and (visualization or VisualizationPolicy()).should_render(base_name, status):
+        writer = artifact_writer or ArtifactWriter(max_workers=1)
+        writer.submit(render_artifacts, output_dir, base_name, detector_type, matcher_type,
+                      image1_path, image2_path, features1, features2, query_idx, train_idx, match_dist,
+                      H if registration_success else None,
+                      image_cache.color if image_cache is not None else None)
+        if artifact_writer is None:
+            writer.close()
+    
     return {
-        "kp1_count": len(kp1), "kp2_count": len(kp2), "good_matches": len(good_matches),
+        "kp1_count": len(pts1), "kp2_count": len(pts2), "good_matches": num_good,
         "detection_time": detection_time, "matching_time": matching_time, "ransac_time": ransac_time,
         "inlier_matches": inlier_matches, "detector": detector_type, "matcher": matcher_type,
-        "match_quality": match_quality, "status": status,
+        "match_quality": match_quality, "status": status, "features_cached": features_cached,
+        "verification_method": verified["method"], "estimated_iterations": verified["estimated_iterations"],
         "image1_path": image1_path, "image2_path": image2_path
     }
 
 
-def find_image_pairs(image_dir):
-    """Find image pairs in directory"""
+def find_images(image_dir):
+    """Find image files in directory (recursively, sorted)"""
     image_files = []
     for root, _, files in os.walk(image_dir):
         for filename in files:
             if any(filename.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png']):
                 image_files.append(os.path.join(root, filename))
+    return sorted(image_files)
+
+
+def find_image_pairs(image_dir):
+    """Find image pairs in directory"""
+    image_files = find_images(image_dir)
     
     image_pairs = {}
     for filepath in image_files:
@@ -190,24 +234,49 @@ def find_image_pairs(image_dir):
     return {k: v for k, v in image_pairs.items() if v.get('a') and v.get('b')}
 
 
-def analyze_results(results_list, output_dir):
-    """Analyze and save results"""
-    if not results_list:
-        return
+def _first_per_key(results, keys):
+    """Yield the first result logged for each of the given keys"""
+    pending = set(keys)
+    for result in results:
+        if result is not None and result.get("key") in pending:
+            pending.discard(result["key"])
+            yield result
+
+
+def analyze_results(results_list, output_dir, aggregator=None, keys=None):
+    """
+    Analyze and save results
     
-    valid_results = [r for r in results_list if r is not None]
+    results_list: iterable of result dicts, or the path of a results log (results.jsonl) written
+    by ResultsLog; it is consumed once, row by row, so a log of any size is never held in memory
+    aggregator: ResultAggregator to add the results to, e.g. one merged from partial aggregates
+    keys: only analyze logged results with these combination keys (each key once), e.g. the
+    current sweep when the log also holds results of earlier ones
+    """
+    if isinstance(results_list, str):
+        results_list = ResultsLog(results_list).read()
+    if keys is not None:
+        results_list = _first_per_key(results_list, keys)
+    aggregator = aggregator or ResultAggregator()
     analysis_dir = os.path.join(output_dir, "analysis")
     os.makedirs(analysis_dir, exist_ok=True)
     
-    # Save CSV
+    # Save CSV while aggregating
     with open(f"{analysis_dir}/detailed_results.csv", 'w', newline='', encoding='utf-8') as csvfile:
         fieldnames = ['base_name', 'detector', 'matcher', 'kp1_count', 'kp2_count',
                      'good_matches', 'inlier_matches', 'match_quality', 'detection_time',
-                     'matching_time', 'ransac_time', 'status']
+                     'matching_time', 'ransac_time', 'status', 'verification_method', 'estimated_iterations']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
         
-        for result in valid_results:
+        skipped = 0
+        for result in results_list:
+            if result is None:
+                continue
+            if not aggregator.add(result):
+                # Logged without image paths (no_features rows of older runs)
+                skipped += 1
+                continue
             base_name = os.path.basename(result['image1_path']).split('_')[0]
             writer.writerow({
                 'base_name': base_name, 'detector': result['detector'], 'matcher': result['matcher'],
@@ -217,84 +286,474 @@ def analyze_results(results_list, output_dir):
                 'detection_time': f"{result['detection_time']:.4f}",
                 'matching_time': f"{result['matching_time']:.4f}",
                 'ransac_time': f"{result['ransac_time']:.4f}",
-                'status': result['status']
+                'status': result['status'],
+                'verification_method': result.get('verification_method', ''),
+                'estimated_iterations': result.get('estimated_iterations')
             })
+    if skipped:
+        print(f"Skipped {skipped} logged results without image paths")
     
-    # Analyze by detector
+    # Distributions per (detector, matcher, image)
+    timing_metrics = ['detection_time', 'matching_time', 'ransac_time']
+    with open(f"{analysis_dir}/group_statistics.csv", 'w', newline='', encoding='utf-8') as csvfile:
+        fieldnames = ['detector', 'matcher', 'base_name', 'runs', 'success_rate']
+        fieldnames += [f"{metric}_{stat}" for metric in timing_metrics
+                       for stat in ['mean', 'std', 'p50', 'p95', 'p99']]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        
+        for (detector, matcher, base_name), group in sorted(aggregator.groups.items()):
+            row = {'detector': detector, 'matcher': matcher, 'base_name': base_name,
+                   'runs': group.runs, 'success_rate': f"{group.success_rate:.1f}"}
+            for metric in timing_metrics:
+                summary = group.metrics[metric].to_dict()
+                for stat in ['mean', 'std', 'p50', 'p95', 'p99']:
+                    row[f"{metric}_{stat}"] = f"{summary[stat]:.4f}"
+            writer.writerow(row)
+    
+    # Analyze by detector and matcher
     detector_analysis = {}
-    matcher_analysis = {}
+    for detector, group in aggregator.rollup(0).items():
+        metrics = group.metrics
+        detector_analysis[detector] = {
+            'total_runs': group.runs, 'successful_runs': group.successes,
+            'total_matches': round(metrics['good_matches'].stats.total),
+            'total_inliers': round(metrics['inlier_matches'].stats.total),
+            'total_detection_time': metrics['detection_time'].stats.total,
+            'avg_match_quality': metrics['match_quality'].stats.mean,
+            'avg_matches': metrics['good_matches'].stats.mean,
+            'avg_inliers': metrics['inlier_matches'].stats.mean,
+            'avg_detection_time': metrics['detection_time'].stats.mean,
+            'success_rate': group.success_rate,
+            'detection_time': metrics['detection_time'].to_dict()
+        }
     
-    for result in valid_results:
-        detector = result['detector']
-        matcher = result['matcher']
-        
-        if detector not in detector_analysis:
-            detector_analysis[detector] = {
-                'total_runs': 0, 'successful_runs': 0, 'total_matches': 0,
-                'total_inliers': 0, 'total_detection_time': 0.0, 'avg_match_quality': 0.0
-            }
-        
-        if matcher not in matcher_analysis:
-            matcher_analysis[matcher] = {
-                'total_runs': 0, 'successful_runs': 0, 'total_matches': 0, 'total_matching_time': 0.0
-            }
-        
-        detector_analysis[detector]['total_runs'] += 1
-        detector_analysis[detector]['total_matches'] += result['good_matches']
-        detector_analysis[detector]['total_inliers'] += result['inlier_matches']
-        detector_analysis[detector]['total_detection_time'] += result['detection_time']
-        detector_analysis[detector]['avg_match_quality'] += result['match_quality']
-        
-        matcher_analysis[matcher]['total_runs'] += 1
-        matcher_analysis[matcher]['total_matches'] += result['good_matches']
-        matcher_analysis[matcher]['total_matching_time'] += result['matching_time']
-        
-        if result['status'] == 'success':
-            detector_analysis[detector]['successful_runs'] += 1
-            matcher_analysis[matcher]['successful_runs'] += 1
-    
-    # Calculate averages
-    for detector in detector_analysis:
-        stats = detector_analysis[detector]
-        if stats['total_runs'] > 0:
-            stats['avg_matches'] = stats['total_matches'] / stats['total_runs']
-            stats['avg_inliers'] = stats['total_inliers'] / stats['total_runs']
-            stats['avg_detection_time'] = stats['total_detection_time'] / stats['total_runs']
-            stats['avg_match_quality'] = stats['avg_match_quality'] / stats['total_runs']
-            stats['success_rate'] = stats['successful_runs'] / stats['total_runs'] * 100
-    
-    for matcher in matcher_analysis:
-        stats = matcher_analysis[matcher]
-        if stats['total_runs'] > 0:
-            stats['avg_matches'] = stats['total_matches'] / stats['total_runs']
-            stats['avg_matching_time'] = stats['total_matching_time'] / stats['total_runs']
-            stats['success_rate'] = stats['successful_runs'] / stats['total_runs'] * 100
+    matcher_analysis = {}
+    for matcher, group in aggregator.rollup(1).items():
+        metrics = group.metrics
+        matcher_analysis[matcher] = {
+            'total_runs': group.runs, 'successful_runs': group.successes,
+            'total_matches': round(metrics['good_matches'].stats.total),
+            'total_matching_time': metrics['matching_time'].stats.total,
+            'avg_matches': metrics['good_matches'].stats.mean,
+            'avg_matching_time': metrics['matching_time'].stats.mean,
+            'success_rate': group.success_rate,
+            'matching_time': metrics['matching_time'].to_dict()
+        }
     
     # Save JSON summary
     summary_data = {
         'detector_analysis': detector_analysis,
         'matcher_analysis': matcher_analysis,
-        'total_experiments': len(valid_results)
+        'total_experiments': sum(group.runs for group in aggregator.groups.values())
     }
     
     with open(f"{analysis_dir}/analysis_summary.json", 'w', encoding='utf-8') as f:
         json.dump(summary_data, f, indent=2, ensure_ascii=False, default=float)
+    return aggregator
+
+
+# Per-process feature store, image cache and artifact writer used by pool workers (set in init_worker)
+_worker_feature_store = None
+_worker_image_cache = None
+_worker_artifact_writer = None
+
+
+def init_worker(cv_threads=1, feature_cache_dir=None, artifact_threads=2, png_compression=None,
+                image_cache_bytes=512 << 20, image_manifest=None, trace_path=None, trace_memory=False):
+    """
+    Limit OpenCV's internal threads and create the per-process feature store, image cache and artifact writer
+
+    image_manifest: shared-memory images published by the parent (ImageCache.publish)
+    trace_path: record profiling spans and save them next to this trace file on exit
+    """
+    global _worker_feature_store, _worker_image_cache, _worker_artifact_writer
+    cv2.setNumThreads(cv_threads)
+    _worker_feature_store = FeatureStore(cache_dir=feature_cache_dir)
+    _worker_image_cache = ImageCache(max_bytes=image_cache_bytes, shared=image_manifest)
+    _worker_artifact_writer = ArtifactWriter(artifact_threads, png_compression=png_compression)
+    # Flush pending artifacts when the worker process exits
+    multiprocessing.util.Finalize(_worker_artifact_writer, _worker_artifact_writer.close, exitpriority=10)
+    if trace_path:
+        profiling.enable(memory=trace_memory)
+        # Runs after the artifact writer has flushed, so its spans are included
+        multiprocessing.util.Finalize(None, profiling.save_part, args=(trace_path,), exitpriority=5)
+
+
+def run_combination(combo, output_base_dir, visualization=None, feature_store=None, artifact_writer=None,
+                    image_cache=None):
+    """Run a single (image pair, detector, matcher) experiment"""
+    current_output_dir = os.path.join(output_base_dir, combo["base_name"])
+    
+    try:
+        with profiling.span("combination", category="experiment", pair=combo["base_name"],
+                            detector=combo["detector_type"], matcher=combo["matcher_type"]):
+            return perform_feature_matching(
+                combo["image1_path"], combo["image2_path"],
+                combo["detector_type"], combo["matcher_type"],
+                output_dir=current_output_dir,
+                feature_store=feature_store or _worker_feature_store,
+                detector_params=combo.get("detector_params"),
+                cross_check=combo.get("cross_check", False),
+                verification=combo.get("verification"),
+                visualization=visualization,
+                artifact_writer=artifact_writer or _worker_artifact_writer,
+                image_cache=image_cache or _worker_image_cache
+            )
+    except cv2.error as e:
+        tqdm.write(f"Failed {combo['base_name']} {combo['detector_type']}/{combo['matcher_type']}: {e}")
+        return None
+
+
+def run_experiments(all_combinations, output_base_dir, results_log, n_workers=1, cv_threads=1,
+                    feature_cache_dir=None, chunksize=1, visualization=None,
+                    artifact_threads=2, png_compression=None, image_cache_bytes=512 << 20,
+                    trace_path=None):
+    """
+    Run all combinations, serially or on a process pool, appending each result to results_log.
+    
+    chunksize should match the number of matchers so that all matchers for one
+    (pair, detector) run in the same worker and share its in-memory feature store.
+    With a pool, the parent decodes every grayscale image once into shared memory (up to
+    image_cache_bytes, on one thread per CPU) and the workers map those buffers instead of
+    calling imread; color images for visualizations are decoded by the rendering worker.
+    results_log: ResultsLog that every finished result is appended to (results are not kept in
+    memory; analyze them from the log); combinations already in the log are not run again.
+    trace_path: Chrome trace the workers' profiling spans are merged into (see profiling.export_chrome_trace)
+    """
+    keys = [combination_key(combo) for combo in all_combinations]
+    done = results_log.completed(set(keys))
+    pending = [(key, combo) for key, combo in zip(keys, all_combinations) if key not in done]
+    if done:
+        print(f"Skipping {len(all_combinations) - len(pending)} combinations already in {results_log.path}")
+    counts = {"skipped": len(all_combinations) - len(pending), "completed": 0, "failed": 0}
+    
+    def record(key, result):
+        if result is None:
+            counts["failed"] += 1
+            return
+        results_log.append(key, result)
+        counts["completed"] += 1
+    
+    pending_combinations = [combo for _, combo in pending]
+    image_cache = ImageCache(max_bytes=image_cache_bytes)
+    if n_workers <= 1:
+        feature_store = FeatureStore(cache_dir=feature_cache_dir)
+        artifact_writer = ArtifactWriter(artifact_threads, png_compression=png_compression)
+        try:
+            for key, combo in tqdm(pending, desc="Running experiments"):
+                record(key, run_combination(combo, output_base_dir, visualization, feature_store,
+                                            artifact_writer, image_cache))
+        finally:
+            artifact_writer.close()
+            image_cache.close()
+        return counts
+    
+    # Only grayscale is published: color is needed just for the few visualizations,
+    # and the worker that renders one decodes it through its own ImageCache
+    paths = [combo[key] for combo in pending_combinations for key in ("image1_path", "image2_path")]
+    try:
+        manifest = image_cache.publish(paths, modes=("gray",))
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker,
+                                 initargs=(cv_threads, feature_cache_dir, artifact_threads,
+                                           png_compression, image_cache_bytes, manifest,
+                                           trace_path if profiling.is_enabled() else None,
+                                           profiling.is_tracing_memory())) as executor:
+            results = executor.map(run_combination, pending_combinations, repeat(output_base_dir),
+                                   repeat(visualization), chunksize=chunksize)
+            for (key, _), result in zip(pending, tqdm(results, total=len(pending),
+                                                       desc=f"Running experiments ({n_workers} workers)")):
+                record(key, result)
+    finally:
+        # Workers have exited (and flushed their artifacts) before the segments are unlinked
+        image_cache.close()
+    return counts
+
+
+def run_gallery_matching(query_paths, gallery_paths, output_base_dir, detector_type="SIFT",
+                         detector_params=None, top_k=5, ratio_thresh=0.75, batch_size=32,
+                         feature_cache_dir=None, max_features_per_image=None):
+    """Match every query image against a gallery through one shared FLANN index"""
+    feature_store = FeatureStore(cache_dir=feature_cache_dir)
+    gallery = GalleryIndex(partial(create_detector, detector_type, detector_params), detector_type,
+                           matcher_config("FLANN", detector_type), detector_params=detector_params,
+                           feature_store=feature_store, max_features_per_image=max_features_per_image)
+    
+    start_time = time.time()
+    gallery.build(tqdm(gallery_paths, desc="Indexing gallery"))
+    index_time = time.time() - start_time
+    
+    analysis_dir = os.path.join(output_base_dir, "analysis")
+    os.makedirs(analysis_dir, exist_ok=True)
+    start_time = time.time()
+    with open(f"{analysis_dir}/gallery_results.csv", 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['query', 'rank', 'gallery_image', 'votes'])
+        writer.writeheader()
+        
+        for i in tqdm(range(0, len(query_paths), batch_size), desc="Querying"):
+            batch = query_paths[i:i + batch_size]
+            for query_path, ranking in gallery.query_many(batch, top_k=top_k, ratio_thresh=ratio_thresh).items():
+                for rank, (gallery_path, votes) in enumerate(ranking, 1):
+                    writer.writerow({'query': query_path, 'rank': rank,
+                                     'gallery_image': gallery_path, 'votes': votes})
+    query_time = time.time() - start_time
+    
+    print(f"Indexed {len(gallery.gallery_paths)} images ({len(gallery.owner)} descriptors) in {index_time:.2f}s")
+    print(f"Matched {len(query_paths)} queries in {query_time:.2f}s")
+
+
+def environment_info(cv_threads=None):
+    """
+    Hardware, OpenCV build and threading settings recorded with benchmark results
+
+    cv_threads: thread count forced with cv2.setNumThreads for the run (None: OpenCV's default)
+    """
+    affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    return {
+        "cpu_count": os.cpu_count(),
+        "usable_cpus": len(affinity) if affinity is not None else os.cpu_count(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+        "opencv_threads_forced": cv_threads,
+        "opencv_optimized": cv2.useOptimized(),
+        "opencl": cv2.ocl.useOpenCL(),
+        "opencv_build_info": cv2.getBuildInformation()
+    }
+
+
+def summarize_timings(samples_ns):
+    """Median/min/max/stddev in seconds of one stage's repeated timings"""
+    seconds = [sample / 1e9 for sample in samples_ns]
+    return {
+        "median": statistics.median(seconds), "min": min(seconds), "max": max(seconds),
+        "stddev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0
+    }
+
+
+def benchmark_combination(combo, warmup=2, repeats=10, ratio_thresh=0.75, image_cache=None):
+    """
+    Time detection, matching and verification of one combination over repeated runs.
+    
+    Images are decoded and the detector/matcher built before timing starts; the
+    warm-up runs absorb first-call initialization (OpenCL kernels, IPP dispatch,
+    lazy allocations) and are discarded. Nothing is cached between repeats.
+    Returns None if an image cannot be read.
+    """
+    image_cache = image_cache or ImageCache()
+    img1, img2 = image_cache.gray(combo["image1_path"]), image_cache.gray(combo["image2_path"])
+    if img1 is None or img2 is None:
+        return None
+    detector_type, matcher_type = combo["detector_type"], combo["matcher_type"]
+    detector = create_detector(detector_type, combo.get("detector_params"))
+    config = matcher_config(matcher_type, detector_type)
+    
+    timings = {"detection": [], "matching": [], "ransac": []}
+    for iteration in range(warmup + repeats):
+        start = time.perf_counter_ns()
+        kp1, des1 = detector.detectAndCompute(img1, None)
+        kp2, des2 = detector.detectAndCompute(img2, None)
+        detection_ns = time.perf_counter_ns() - start
+        
+        matching_ns = ransac_ns = 0
+        num_good = inliers = 0
+        if des1 is not None and des2 is not None and len(kp1) > 0 and len(kp2) > 0:
+            des1, des2 = prepare_descriptors(des1, des2, matcher_type, detector_type)
+            start = time.perf_counter_ns()
+            knn_idx, knn_dist = knn_match_arrays(des1, des2, config, k=2)
+            query_idx, train_idx, match_dist = ratio_test(knn_idx, knn_dist, ratio_thresh)
+            matching_ns = time.perf_counter_ns() - start
+            num_good = len(query_idx)
+            
+            pts1 = np.array([kp.pt for kp in kp1], dtype=np.float32)
+            pts2 = np.array([kp.pt for kp in kp2], dtype=np.float32)
+            src_pts = pts1[query_idx].reshape(-1, 1, 2)
+            dst_pts = pts2[train_idx].reshape(-1, 1, 2)
+            start = time.perf_counter_ns()
+            verified = verify_homography(src_pts, dst_pts, match_dist, combo.get("verification"))
+            ransac_ns = time.perf_counter_ns() - start
+            inliers = verified["inliers"]
+        
+        if iteration >= warmup:
+            timings["detection"].append(detection_ns)
+            timings["matching"].append(matching_ns)
+            timings["ransac"].append(ransac_ns)
+    
+    return {
+        "base_name": combo["base_name"], "detector": detector_type, "matcher": matcher_type,
+        "repeats": repeats, "warmup": warmup, "kp1_count": len(kp1), "kp2_count": len(kp2),
+        "good_matches": num_good, "inlier_matches": inliers,
+        **{f"{stage}_time": summarize_timings(samples) for stage, samples in timings.items()}
+    }
+
+
+def run_benchmark(all_combinations, output_base_dir, warmup=2, repeats=10, cv_threads=None):
+    """
+    Benchmark every combination serially and save the timings with the environment they were taken in
+    
+    cv_threads: OpenCV thread count for the run (default: leave OpenCV's setting unchanged)
+    """
+    if cv_threads is not None:
+        cv2.setNumThreads(cv_threads)
+    image_cache = ImageCache()
+    try:
+        results = [benchmark_combination(combo, warmup, repeats, image_cache=image_cache)
+                   for combo in tqdm(all_combinations, desc=f"Benchmarking ({warmup} warm-up, {repeats} runs)")]
+    finally:
+        image_cache.close()
+    results = [result for result in results if result is not None]
+    
+    analysis_dir = os.path.join(output_base_dir, "analysis")
+    os.makedirs(analysis_dir, exist_ok=True)
+    with open(f"{analysis_dir}/benchmark_results.csv", 'w', newline='', encoding='utf-8') as csvfile:
+        stages = ['detection_time', 'matching_time', 'ransac_time']
+        fieldnames = ['base_name', 'detector', 'matcher', 'repeats', 'kp1_count', 'kp2_count',
+                      'good_matches', 'inlier_matches']
+        fieldnames += [f"{stage}_{stat}" for stage in stages for stat in ['median', 'min', 'stddev']]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            row = dict(result)
+            for stage in stages:
+                for stat in ['median', 'min', 'stddev']:
+                    row[f"{stage}_{stat}"] = f"{result[stage][stat]:.6f}"
+            writer.writerow(row)
+    
+    with open(f"{analysis_dir}/benchmark_results.json", 'w', encoding='utf-8') as f:
+        json.dump({"environment": environment_info(cv_threads), "warmup": warmup, "repeats": repeats,
+                   "results": results}, f, indent=2, ensure_ascii=False, default=float)
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Feature detector / matcher comparison")
+    parser.add_argument("--mode", choices=["pairs", "gallery", "benchmark"], default="pairs",
+                        help="pairs: *_a/*_b pair sweep, gallery: match queries against a shared gallery index, "
+                             "benchmark: repeated timing runs of the pair sweep")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs per combination (benchmark mode)")
+    parser.add_argument("--repeats", type=int, default=10, help="timed runs per combination (benchmark mode)")
+    parser.add_argument("--gallery-dir", default=None, help="gallery images (gallery mode, default: match_pics/)")
+    parser.add_argument("--query-dir", default=None, help="query images (gallery mode, default: gallery)")
+    parser.add_argument("--gallery-detector", default="SIFT", help="detector used in gallery mode")
+    parser.add_argument("--top-k", type=int, default=5, help="gallery images reported per query")
+    parser.add_argument("--max-features", type=int, default=None,
+                        help="strongest keypoints kept per image in gallery mode")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (1 = serial)")
+    parser.add_argument("--cv-threads", type=int, default=None,
+                        help="force cv2.setNumThreads: per worker process (default 1 with --workers > 1) "
+                             "or for the benchmark run (default: OpenCV's own setting)")
+    parser.add_argument("--feature-cache", default=None,
+                        help="directory for cached keypoints/descriptors (.npz)")
+    parser.add_argument("--detector-param", action="append", default=[], metavar="DETECTOR.NAME=VALUE",
+                        help="detector constructor override, e.g. ORB.nfeatures=5000 (repeatable)")
+    parser.add_argument("--cross-check", action="store_true",
+                        help="keep only mutual nearest-neighbour matches after the ratio test")
+    parser.add_argument("--verify-method", choices=list(VERIFICATION_METHODS),
+                        default=DEFAULT_VERIFICATION["method"], help="homography estimator")
+    parser.add_argument("--reproj-thresh", type=float, default=DEFAULT_VERIFICATION["reproj_thresh"],
+                        help="inlier reprojection threshold in pixels")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_VERIFICATION["confidence"])
+    parser.add_argument("--max-iters", type=int, default=DEFAULT_VERIFICATION["max_iters"])
+    parser.add_argument("--min-matches", type=int, default=DEFAULT_VERIFICATION["min_matches"],
+                        help="skip verification for pairs with fewer ratio-test matches")
+    parser.add_argument("--visualize", choices=VisualizationPolicy.MODES, default="all",
+                        help="which experiments write keypoint/match/registration images")
+    parser.add_argument("--sample", type=int, default=3,
+                        help="number of image pairs to visualize with --visualize sample")
+    parser.add_argument("--artifact-threads", type=int, default=2,
+                        help="background threads rendering and encoding visualizations")
+    parser.add_argument("--png-compression", type=int, default=None,
+                        help="PNG compression level 0-9 for visualizations (OpenCV default if omitted)")
+    parser.add_argument("--results-log", default=None,
+                        help="append-only JSONL log of finished experiments; a rerun skips logged combinations "
+                             "(default: <output>/analysis/results.jsonl)")
+    parser.add_argument("--fresh", action="store_true", help="ignore and overwrite an existing results log")
+    parser.add_argument("--analyze-only", action="store_true",
+                        help="only rebuild the analysis files from the results log")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="record per-stage timings and write a Chrome trace (open in ui.perfetto.dev)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record peak traced memory with tracemalloc (slower)")
+    parser.add_argument("--image-cache-mb", type=int, default=512,
+                        help="memory budget for decoded images (shared with pool workers)")
+    return parser.parse_args()
+
+
+def parse_detector_params(overrides):
+    """Turn ["ORB.nfeatures=5000", ...] into {"ORB": {"nfeatures": 5000}, ...}"""
+    detector_params = {}
+    for override in overrides:
+        target, value = override.split("=", 1)
+        detector_type, name = target.split(".", 1)
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+        detector_params.setdefault(detector_type, {})[name] = value
+    return detector_params
 
 
 def main():
     """Main experiment function"""
+    args = parse_args()
+    if args.trace:
+        profiling.enable(memory=args.trace_memory)
+    try:
+        run(args)
+    finally:
+        if args.trace:
+            totals = profiling.export_chrome_trace(args.trace, metadata={"mode": args.mode, "workers": args.workers})
+            print(f"Trace written to {args.trace}")
+            for name, total in sorted(totals.items(), key=lambda item: -item[1]["total_s"]):
+                print(f"  {name:<20} {total['total_s']:9.3f}s  ({total['count']} spans)")
+
+
+def run(args):
+    """Run the selected mode"""
     image_dir = "match_pics/"
     output_base_dir = "feature_matching_results"
     
     if not os.path.exists(output_base_dir):
         os.makedirs(output_base_dir)
     
+    if args.mode == "gallery":
+        gallery_paths = find_images(args.gallery_dir or image_dir)
+        query_paths = find_images(args.query_dir) if args.query_dir else gallery_paths
+        run_gallery_matching(query_paths, gallery_paths, output_base_dir,
+                             detector_type=args.gallery_detector,
+                             detector_params=parse_detector_params(args.detector_param).get(args.gallery_detector),
+                             top_k=args.top_k, feature_cache_dir=args.feature_cache,
+                             max_features_per_image=args.max_features)
+        return
+    
+    results_log_path = args.results_log or os.path.join(output_base_dir, "analysis", "results.jsonl")
+    if args.analyze_only:
+        analyze_results(results_log_path, output_base_dir)
+        return
+    if args.fresh and os.path.exists(results_log_path):
+        os.remove(results_log_path)
+    
     # Find image pairs
     image_pairs = find_image_pairs(image_dir)
     
     # Configuration
     detector_types = ["SIFT", "ORB", "AKAZE", "KAZE", "BRISK"]
     matcher_types = ["BF", "FLANN"]
+    detector_params = parse_detector_params(args.detector_param)
+    verification = {
+        "method": args.verify_method, "reproj_thresh": args.reproj_thresh,
+        "confidence": args.confidence, "max_iters": args.max_iters, "min_matches": args.min_matches
+    }
+    if args.visualize == "sample":
+        # Artifacts are named after the first '_'-separated token of the image file name
+        artifact_names = {os.path.basename(paths['a']).split('_')[0] for paths in image_pairs.values()}
+        visualization = VisualizationPolicy.sample(artifact_names, args.sample)
+    else:
+        visualization = VisualizationPolicy(args.visualize)
     
     # Create all combinations
     all_combinations = []
@@ -306,26 +765,34 @@ def main():
                     "image1_path": paths['a'],
                     "image2_path": paths['b'],
                     "detector_type": detector_type,
-                    "matcher_type": matcher_type
+                    "matcher_type": matcher_type,
+                    "detector_params": detector_params.get(detector_type),
+                    "cross_check": args.cross_check,
+                    "verification": verification
                 })
     
-    # Run experiments
-    all_results = []
-    for combo in tqdm(all_combinations, desc="Running experiments"):
-        current_output_dir = os.path.join(output_base_dir, combo["base_name"])
-        os.makedirs(current_output_dir, exist_ok=True)
-        
-        result = perform_feature_matching(
-            combo["image1_path"], combo["image2_path"],
-            combo["detector_type"], combo["matcher_type"],
-            output_dir=current_output_dir
-        )
-        
-        all_results.append(result)
+    if args.mode == "benchmark":
+        run_benchmark(all_combinations, output_base_dir, warmup=args.warmup, repeats=max(args.repeats, 1),
+                      cv_threads=args.cv_threads)
+        return
+    
+    # Run experiments (each finished result is appended to the log right away)
+    with ResultsLog(results_log_path) as results_log:
+        counts = run_experiments(all_combinations, output_base_dir, results_log,
+                                 n_workers=args.workers,
+                                 cv_threads=1 if args.cv_threads is None else args.cv_threads,
+                                 feature_cache_dir=args.feature_cache, chunksize=len(matcher_types),
+                                 visualization=visualization, artifact_threads=args.artifact_threads,
+                                 png_compression=args.png_compression,
+                                 image_cache_bytes=args.image_cache_mb << 20, trace_path=args.trace)
+    print(f"Experiments: {counts['completed']} completed, {counts['skipped']} already logged, "
+          f"{counts['failed']} failed")
     
-    # Analyze results
-    analyze_results(all_results, output_base_dir)
+    # Analyze results (streamed from the log, restricted to this sweep's combinations)
+    with profiling.span("analyze_results"):
+        analyze_results(results_log_path, output_base_dir,
+                        keys=(combination_key(combo) for combo in all_combinations))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import profiling
+
+
+def keypoints_to_arrays(keypoints, descriptors):
+    """Pack cv2.KeyPoint objects and descriptors into compact NumPy arrays"""
+    n = len(keypoints) if keypoints else 0
+    return {
+        "pts": np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(n, 2),
+        "size": np.array([kp.size for kp in keypoints], dtype=np.float32),
+        "angle": np.array([kp.angle for kp in keypoints], dtype=np.float32),
+        "response": np.array([kp.response for kp in keypoints], dtype=np.float32),
+        "octave": np.array([kp.octave for kp in keypoints], dtype=np.int32),
+        "descriptors": descriptors,
+    }
+
+
+def arrays_to_keypoints(features):
+    """Rebuild cv2.KeyPoint objects (only needed for drawing)"""
+    return [cv2.KeyPoint(float(x), float(y), float(s), float(a), float(r), int(o))
+            for (x, y), s, a, r, o in zip(features["pts"], features["size"], features["angle"],
+                                          features["response"], features["octave"])]
+
+
+class FeatureStore:
+    """
+    Keypoint/descriptor cache keyed by image content hash, detector type and detector parameters.
+
+    Entries are kept in memory with LRU eviction and, if cache_dir is given,
+    also saved as .npz files so later runs skip detection entirely.
+    """
+
+    def __init__(self, max_entries=16, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._entries = OrderedDict()
+        self._hashes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def image_hash(self, image_path):
+        """Content hash of an image file (memoized by path, size and mtime)"""
+        stat = os.stat(image_path)
+        memo_key = (image_path, stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hashes:
+            digest = hashlib.blake2b(digest_size=16)
+            with open(image_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            self._hashes[memo_key] = digest.hexdigest()
+        return self._hashes[memo_key]
+
+    def make_key(self, image_path, detector_type, params=None):
+        params_json = json.dumps(params or {}, sort_keys=True, default=str)
+        params_hash = hashlib.blake2b(params_json.encode(), digest_size=8).hexdigest()
+        return f"{self.image_hash(image_path)}_{detector_type}_{params_hash}"
+
+    def get(self, key):
+        """Look up an entry in memory, then on disk"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{key}.npz")
+            if os.path.exists(path):
+                try:
+                    with np.load(path) as data:
+                        features = {name: data[name] for name in
+                                    ["pts", "size", "angle", "response", "octave", "descriptors"]}
+                        features["detection_time"] = float(data["detection_time"])
+                        if not bool(data["has_descriptors"]):
+                            features["descriptors"] = None
+                except (OSError, ValueError, KeyError):
+                    return None
+                self._remember(key, features)
+                return features
+        return None
+
+    def put(self, key, features):
+        self._remember(key, features)
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{key}.npz")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            descriptors = features["descriptors"]
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, pts=features["pts"], size=features["size"], angle=features["angle"],
+                         response=features["response"], octave=features["octave"],
+                         descriptors=descriptors if descriptors is not None else np.zeros((0, 0), np.uint8),
+                         has_descriptors=descriptors is not None,
+                         detection_time=features["detection_time"])
+            os.replace(tmp_path, path)
+
+    def _remember(self, key, features):
+        self._entries[key] = features
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, image_path, detector_type, make_detector, params=None, load_image=None):
+        """
+        Return (features, cached) for an image, running detection only on a miss.
+
+        make_detector: callable returning the detector (only called on a miss)
+        load_image: callable(path) -> grayscale image (default: cv2.imread)
+        Returns (None, False) if the image cannot be loaded.
+        """
+        try:
+            key = self.make_key(image_path, detector_type, params)
+        except OSError:
+            return None, False
+        features = self.get(key)
+        if features is not None:
+            self.hits += 1
+            return features, True
+
+        self.misses += 1
+        if load_image:
+            img = load_image(image_path)
+        else:
+            with profiling.span("imread"):
+                img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return None, False
+
+        detector = make_detector()
+        with profiling.span("detect", detector=detector_type):
+            start_time = time.perf_counter_ns()
+            keypoints, descriptors = detector.detectAndCompute(img, None)
+            features = keypoints_to_arrays(keypoints, descriptors)
+            features["detection_time"] = (time.perf_counter_ns() - start_time) / 1e9
+
+        self.put(key, features)
+        return features, False
@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+
+from feature_store import FeatureStore
+from matching import flann_knn_search
+
+
+class GalleryIndex:
+    """
+    Many-to-many matching against an image gallery through one shared FLANN index.
+
+    The descriptors of all gallery images are stacked into a single KD-tree
+    (float descriptors) or LSH (binary descriptors) index that is built once
+    and reused for every query. Each query descriptor votes for the gallery
+    image of its nearest neighbour if it passes the ratio test, and images
+    are ranked by vote count.
+    """
+
+    def __init__(self, make_detector, detector_type, config, detector_params=None,
+                 feature_store=None, max_features_per_image=None):
+        """
+        make_detector: callable returning the detector (only called on feature store misses)
+        config: FLANN configuration, {"index_params": ..., "search_params": ...}
+        max_features_per_image: keep only the strongest keypoints (by response) of each image
+        """
+        self.make_detector = make_detector
+        self.detector_type = detector_type
+        self.detector_params = detector_params
+        self.config = config
+        self.feature_store = feature_store or FeatureStore()
+        self.max_features_per_image = max_features_per_image
+        self.binary = config["index_params"].get("algorithm") == 6
+        self.gallery_paths = []
+        self.owner = None
+        self.index = None
+
+    def _descriptors(self, image_path):
+        features, _ = self.feature_store.get_or_compute(image_path, self.detector_type, self.make_detector,
+                                                        params=self.detector_params)
+        if features is None or features["descriptors"] is None:
+            return None
+        desc = features["descriptors"]
+        if self.max_features_per_image and len(desc) > self.max_features_per_image:
+            strongest = np.argsort(-features["response"], kind="stable")[:self.max_features_per_image]
+            desc = desc[np.sort(strongest)]
+        return np.uint8(desc) if self.binary else np.float32(desc)
+
+    def build(self, gallery_paths):
+        """Describe every gallery image and build the shared index"""
+        descriptors = []
+        counts = []
+        self.gallery_paths = []
+        for path in gallery_paths:
+            desc = self._descriptors(path)
+            if desc is None or len(desc) == 0:
+                continue
+            self.gallery_paths.append(path)
+            descriptors.append(desc)
+            counts.append(len(desc))
+
+        if not descriptors:
+            raise ValueError("No descriptors found in the gallery")
+        # owner[i] = gallery image of stacked descriptor i
+        self.owner = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        self.index = cv2.flann_Index(np.concatenate(descriptors), self.config["index_params"])
+        return self
+
+    def _vote(self, idx, dist, ratio_thresh, exclude=None):
+        """
+        Ratio test against the nearest neighbour from a *different* gallery image,
+        so near-duplicate gallery images do not cancel each other's votes.
+
+        exclude: gallery image id whose descriptors are ignored (the query itself)
+        """
+        valid = idx >= 0
+        owners = np.where(valid, self.owner[np.maximum(idx, 0)], -1)
+        if exclude is not None:
+            valid &= owners != exclude
+
+        rows = np.arange(len(idx))
+        best_col = np.argmax(valid, axis=1)
+        has_best = valid[rows, best_col]
+        best_owner = owners[rows, best_col]
+        best_dist = dist[rows, best_col]
+
+        # Distance to the first neighbour owned by another image (inf if none among the k)
+        other = valid & (owners != best_owner[:, None])
+        second = np.where(other, dist, np.inf).min(axis=1)
+
+        keep = has_best & (best_dist < ratio_thresh * second)
+        return np.bincount(best_owner[keep], minlength=len(self.gallery_paths))
+
+    def query_many(self, query_paths, top_k=5, ratio_thresh=0.75, k_nn=3, exclude_self=True):
+        """
+        Match several query images against the gallery with one batched knnSearch.
+
+        Returns {query_path: [(gallery_path, votes), ...]} with the top_k images by votes.
+        """
+        if self.index is None:
+            raise RuntimeError("GalleryIndex.build() must be called first")
+
+        gallery_ids = {path: i for i, path in enumerate(self.gallery_paths)}
+        queries = [(path, self._descriptors(path)) for path in query_paths]
+        stacked = [desc for _, desc in queries if desc is not None and len(desc) > 0]
+        results = {path: [] for path, _ in queries}
+        if not stacked:
+            return results
+
+        # One extra neighbour in case the query itself is part of the gallery
+        idx, dist = flann_knn_search(self.index, np.concatenate(stacked), k_nn + int(exclude_self), self.config)
+
+        offset = 0
+        for path, desc in queries:
+            if desc is None or len(desc) == 0:
+                continue
+            rows = slice(offset, offset + len(desc))
+            offset += len(desc)
+            exclude = gallery_ids.get(path) if exclude_self else None
+            votes = self._vote(idx[rows], dist[rows], ratio_thresh, exclude)
+            ranked = np.argsort(-votes, kind="stable")[:top_k]
+            results[path] = [(self.gallery_paths[i], int(votes[i])) for i in ranked if votes[i] > 0]
+        return results
+
+    def query(self, query_path, top_k=5, ratio_thresh=0.75, k_nn=3, exclude_self=True):
+        """Top-K gallery images for a single query image"""
+        return self.query_many([query_path], top_k, ratio_thresh, k_nn, exclude_self)[query_path]
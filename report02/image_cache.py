@@ -0,0 +1,172 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+import profiling
+
+IMREAD_FLAGS = {"gray": cv2.IMREAD_GRAYSCALE, "color": cv2.IMREAD_COLOR}
+
+_register_lock = threading.Lock()
+
+
+def _attach_segment(name):
+    """Open an existing shared memory segment without handing it to this process's resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Python < 3.13 has no track argument. Keep the attach from registering the segment at all:
+    # unregistering afterwards would also drop the parent's registration when a forked worker
+    # shares the parent's tracker, and the parent's unlink() would then make the tracker complain
+    with _register_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _decode_ahead(executor, keys, lookahead):
+    """Yield (key, image) for (path, mode) keys in order, with at most lookahead decodes in flight"""
+    pending = deque()
+    try:
+        for key in keys:
+            if len(pending) >= lookahead:
+                yield pending[0][0], pending.popleft()[1].result()
+            pending.append((key, executor.submit(_imread, *key)))
+        while pending:
+            yield pending[0][0], pending.popleft()[1].result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def _imread(path, mode):
+    with profiling.span("imread", mode=mode):
+        return cv2.imread(path, IMREAD_FLAGS[mode])
+
+
+class ImageCache:
+    """
+    Decoded image cache with a memory budget and LRU eviction.
+
+    Every (path, mode) is decoded at most once per process while it stays in
+    the cache. The parent process can also decode images up front into
+    shared memory with publish(); workers created from the returned manifest
+    (ImageCache(shared=manifest)) map those arrays directly instead of
+    decoding or unpickling them.
+
+    mode: "gray" (cv2.IMREAD_GRAYSCALE) or "color" (cv2.IMREAD_COLOR)
+    """
+
+    def __init__(self, max_bytes=512 << 20, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = dict(shared or {})  # (path, mode) -> (segment name, shape, dtype)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._segments = {}
+        self._owned = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def gray(self, path):
+        return self.get(path, "gray")
+
+    def color(self, path):
+        return self.get(path, "color")
+
+    def get(self, path, mode="gray"):
+        """Return the decoded image (read-only, shared with other callers) or None if it cannot be read"""
+        key = (path, mode)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            if key in self.shared:
+                self.hits += 1
+                return self._attach(key)
+            self.misses += 1
+
+        # Decode outside the lock (imread releases the GIL)
+        img = _imread(path, mode)
+        if img is None:
+            return None
+        img.flags.writeable = False
+        with self._lock:
+            self._remember(key, img)
+        return img
+
+    def _attach(self, key):
+        name, shape, dtype = self.shared[key]
+        if name not in self._segments:
+            self._segments[name] = _attach_segment(name)
+        img = np.ndarray(shape, dtype=dtype, buffer=self._segments[name].buf)
+        img.flags.writeable = False
+        return img
+
+    def _remember(self, key, img):
+        if img.nbytes > self.max_bytes:
+            return
+        if key not in self._entries:
+            self._bytes += img.nbytes
+        self._entries[key] = img
+        self._entries.move_to_end(key)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def publish(self, paths, modes=("gray",), n_threads=None):
+        """
+        Decode images into shared memory segments owned by this cache.
+
+        Images are decoded on n_threads threads (default: one per CPU; imread
+        releases the GIL) and copied into segments in path order. Stops
+        publishing once max_bytes of segments exist; the remaining images are
+        decoded lazily by whoever needs them.
+        Returns the manifest to pass to ImageCache(shared=...) in other processes.
+        """
+        published = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in self.shared.values())
+        keys = [(path, mode) for path in dict.fromkeys(paths) for mode in modes if (path, mode) not in self.shared]
+        n_threads = n_threads or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            decoded = _decode_ahead(executor, keys, lookahead=2 * n_threads)
+            try:
+                for key, img in decoded:
+                    if img is None:
+                        continue
+                    if published + img.nbytes > self.max_bytes:
+                        break
+                    segment = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+                    np.ndarray(img.shape, dtype=img.dtype, buffer=segment.buf)[...] = img
+                    self._owned.append(segment)
+                    self._segments[segment.name] = segment
+                    self.shared[key] = (segment.name, img.shape, img.dtype.str)
+                    published += img.nbytes
+            finally:
+                decoded.close()
+        return dict(self.shared)
+
+    def close(self):
+        """Drop cached arrays, detach from shared segments and unlink the ones this cache created"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for segment in self._segments.values():
+                try:
+                    segment.close()
+                except BufferError:
+                    # An array still references the mapping; it is released with the process
+                    pass
+            for segment in self._owned:
+                segment.unlink()
+            self._segments.clear()
+            self._owned.clear()
+            self.shared.clear()
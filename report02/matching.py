@@ -0,0 +1,150 @@
+import cv2
+import numpy as np
+
+
+def knn_match_arrays(desc1, desc2, config, k=2):
+    """
+    k-nearest-neighbour matching that returns NumPy arrays instead of DMatch objects.
+
+    config: matcher configuration, {"norm": ...} for brute force or
+    {"index_params": ..., "search_params": ...} for FLANN
+    Returns (train_idx, distances), both of shape (len(desc1), k); missing
+    neighbours have index -1 and distance inf.
+    """
+    n_query = len(desc1)
+    k_eff = min(k, len(desc2))
+    train_idx = np.full((n_query, k), -1, dtype=np.int32)
+    distances = np.full((n_query, k), np.inf, dtype=np.float32)
+    if n_query == 0 or k_eff == 0:
+        return train_idx, distances
+
+    if "norm" in config:
+        # Brute force: same kernel as BFMatcher.knnMatch
+        dtype = cv2.CV_32S if config["norm"] in (cv2.NORM_HAMMING, cv2.NORM_HAMMING2) else cv2.CV_32F
+        dist, idx = cv2.batchDistance(desc1, desc2, dtype, normType=config["norm"], K=k_eff)
+    else:
+        index = cv2.flann_Index(desc2, config["index_params"])
+        idx, dist = flann_knn_search(index, desc1, k_eff, config)
+
+    train_idx[:, :k_eff] = idx
+    distances[:, :k_eff] = dist
+    distances[train_idx < 0] = np.inf
+    return train_idx, distances
+
+
+def flann_knn_search(index, desc, k, config):
+    """knnSearch on a prebuilt cv2.flann_Index, returning (indices, L2/Hamming distances)"""
+    idx, dist = index.knnSearch(desc, k, params=config["search_params"])
+    if config["index_params"].get("algorithm") != 6:
+        # KD-tree reports squared L2 distances
+        dist = np.sqrt(np.maximum(dist, 0))
+    return idx, dist
+
+
+def ratio_test(train_idx, distances, ratio_thresh=0.75):
+    """
+    Lowe's ratio test on kNN arrays.
+
+    Returns (query_idx, train_idx, distances) of the surviving best matches.
+    """
+    valid = (train_idx[:, 0] >= 0) & (train_idx[:, 1] >= 0)
+    keep = valid & (distances[:, 0] < ratio_thresh * distances[:, 1])
+    query_idx = np.flatnonzero(keep).astype(np.int32)
+    return query_idx, train_idx[keep, 0], distances[keep, 0]
+
+
+def mutual_filter(query_idx, train_idx, desc1, desc2, config):
+    """Keep only matches whose train descriptor also picks the query descriptor as its nearest neighbour"""
+    if len(query_idx) == 0:
+        return np.zeros(0, dtype=bool)
+    reverse_idx, _ = knn_match_arrays(desc2, desc1, config, k=1)
+    return reverse_idx[train_idx, 0] == query_idx
+
+
+def to_dmatches(query_idx, train_idx, distances):
+    """Build DMatch objects (only needed for drawing)"""
+    return [cv2.DMatch(int(q), int(t), float(d)) for q, t, d in zip(query_idx, train_idx, distances)]
+
+
+# Robust estimators accepted by cv2.findHomography
+VERIFICATION_METHODS = {
+    "RANSAC": cv2.RANSAC,
+    "LMEDS": cv2.LMEDS,
+    "RHO": cv2.RHO,
+    "USAC_DEFAULT": cv2.USAC_DEFAULT,
+    "USAC_PARALLEL": cv2.USAC_PARALLEL,
+    "USAC_FAST": cv2.USAC_FAST,
+    "USAC_ACCURATE": cv2.USAC_ACCURATE,
+    "USAC_PROSAC": cv2.USAC_PROSAC,
+    "USAC_MAGSAC": cv2.USAC_MAGSAC,
+}
+
+# Methods that stop with the standard RANSAC bound, so estimate_iterations describes them
+# (LMEDS, RHO, PROSAC and MAGSAC use other sampling or termination rules)
+RANSAC_BOUND_METHODS = {"RANSAC", "USAC_DEFAULT", "USAC_PARALLEL", "USAC_FAST", "USAC_ACCURATE"}
+
+DEFAULT_VERIFICATION = {
+    "method": "RANSAC",
+    "reproj_thresh": 5.0,
+    "confidence": 0.995,
+    "max_iters": 2000,
+    # Pairs with fewer putative matches are rejected without calling the estimator
+    "min_matches": 5,
+}
+
+
+def estimate_iterations(inlier_ratio, confidence, max_iters, sample_size=4):
+    """
+    Number of RANSAC iterations needed for the given confidence at the observed inlier ratio.
+
+    OpenCV does not report how many iterations were run; with adaptive
+    termination this is the count at which it stops (capped at max_iters).
+    """
+    if inlier_ratio <= 0:
+        return max_iters
+    if inlier_ratio >= 1:
+        return 1
+    p_all_inliers = inlier_ratio ** sample_size
+    n = np.log(1 - confidence) / np.log1p(-p_all_inliers)
+    return int(min(max(np.ceil(n), 1), max_iters))
+
+
+def verify_homography(src_pts, dst_pts, match_dist=None, verification=None):
+    """
+    Geometric verification of putative matches with a homography.
+
+    verification: overrides for DEFAULT_VERIFICATION
+    Returns dict with H (None on failure), mask, inliers, estimated_iterations
+    (estimate_iterations for RANSAC_BOUND_METHODS, otherwise None), method and
+    skipped (True when the pre-filter rejected the pair).
+    """
+    config = {**DEFAULT_VERIFICATION, **(verification or {})}
+    result = {"H": None, "mask": None, "inliers": 0, "estimated_iterations": None,
+              "method": config["method"], "skipped": False}
+
+    if len(src_pts) < max(config["min_matches"], 4):
+        result["skipped"] = True
+        return result
+
+    if config["method"] == "USAC_PROSAC" and match_dist is not None:
+        # PROSAC samples the best-ranked matches first
+        order = np.argsort(match_dist, kind="stable")
+        src_pts, dst_pts = src_pts[order], dst_pts[order]
+    else:
+        order = None
+
+    H, mask = cv2.findHomography(src_pts, dst_pts, VERIFICATION_METHODS[config["method"]],
+                                 config["reproj_thresh"], maxIters=config["max_iters"],
+                                 confidence=config["confidence"])
+    if mask is not None:
+        if order is not None:
+            unsorted = np.empty_like(mask)
+            unsorted[order] = mask
+            mask = unsorted
+        result["inliers"] = int(np.count_nonzero(mask))
+        if config["method"] in RANSAC_BOUND_METHODS:
+            result["estimated_iterations"] = estimate_iterations(result["inliers"] / len(src_pts),
+                                                                 config["confidence"], config["max_iters"])
+    result["H"] = H
+    result["mask"] = mask
+    return result
@@ -0,0 +1,13 @@
+# Stage profiling shared with report01: the implementation lives in
+# report01/utils/profiling.py, loaded here under this module's name so that
+# `import profiling` in report02 and `from utils import profiling` in report01
+# run the same code.
+import importlib.util
+import sys
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    __name__, Path(__file__).resolve().parent.parent / "report01" / "utils" / "profiling.py")
+_module = importlib.util.module_from_spec(_spec)
+sys.modules[__name__] = _module
+_spec.loader.exec_module(_module)
@@ -0,0 +1,215 @@
+import math
+import os
+
+
+class RunningStats:
+    """Count, mean, variance (Welford), min and max of a stream of values"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Combine with the statistics of another stream (Chan et al. pairwise update)"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def total(self):
+        return self.mean * self.count
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative accuracy (logarithmic buckets, as in DDSketch).
+
+    Every quantile estimate of a positive value is within relative_accuracy of
+    the true value. Values <= 0 are counted in a single zero bucket. At most
+    max_buckets buckets are kept; beyond that the lowest ones are collapsed,
+    which only affects the accuracy of the smallest quantiles.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge quantile sketches with different accuracy")
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        return self
+
+    def _collapse(self):
+        indices = sorted(self.buckets)
+        excess = indices[:len(indices) - self.max_buckets + 1]
+        self.buckets[excess[-1]] += sum(self.buckets.pop(index) for index in excess[:-1])
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or nan for an empty sketch"""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class MetricSummary:
+    """Running statistics plus a quantile sketch for one metric"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, relative_accuracy=0.01):
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value):
+        self.stats.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def to_dict(self):
+        summary = {"count": self.stats.count, "mean": self.stats.mean, "std": self.stats.std,
+                   "min": self.stats.min if self.stats.count else math.nan,
+                   "max": self.stats.max if self.stats.count else math.nan}
+        for q in self.QUANTILES:
+            summary[f"p{round(q * 100)}"] = self.sketch.quantile(q)
+        return summary
+
+
+class GroupStats:
+    """Run/success counts and metric summaries of one group of results"""
+
+    def __init__(self, metrics, relative_accuracy=0.01):
+        self.runs = 0
+        self.successes = 0
+        self.metrics = {name: MetricSummary(relative_accuracy) for name in metrics}
+
+    def add(self, result):
+        self.runs += 1
+        if result['status'] == 'success':
+            self.successes += 1
+        for name, summary in self.metrics.items():
+            summary.add(float(result[name]))
+
+    def merge(self, other):
+        self.runs += other.runs
+        self.successes += other.successes
+        for name, summary in self.metrics.items():
+            summary.merge(other.metrics[name])
+        return self
+
+    @property
+    def success_rate(self):
+        return self.successes / self.runs * 100 if self.runs else 0.0
+
+
+class ResultAggregator:
+    """
+    Streaming per-(detector, matcher, image) aggregation of experiment results.
+
+    Memory grows with the number of groups, not with the number of results.
+    Aggregators built on separate shards of the results (e.g. in pool
+    workers) are pickleable and can be combined with merge().
+    """
+
+    METRICS = ("detection_time", "matching_time", "ransac_time", "good_matches", "inlier_matches",
+               "match_quality")
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.groups = {}
+
+    @staticmethod
+    def group_key(result):
+        """(detector, matcher, image base name), or None for a result without image paths"""
+        if 'image1_path' not in result:
+            return None
+        base_name = os.path.basename(result['image1_path']).split('_')[0]
+        return result['detector'], result['matcher'], base_name
+
+    def add(self, result):
+        """Add one result; returns False (and skips it) when it has no group key"""
+        key = self.group_key(result)
+        if key is None:
+            return False
+        if key not in self.groups:
+            self.groups[key] = GroupStats(self.METRICS, self.relative_accuracy)
+        self.groups[key].add(result)
+        return True
+
+    def merge(self, other):
+        for key, group in other.groups.items():
+            if key not in self.groups:
+                self.groups[key] = GroupStats(self.METRICS, self.relative_accuracy)
+            self.groups[key].merge(group)
+        return self
+
+    def rollup(self, field):
+        """Combine groups by one key field: 0 = detector, 1 = matcher, 2 = image"""
+        rolled = {}
+        for key, group in self.groups.items():
+            if key[field] not in rolled:
+                rolled[key[field]] = GroupStats(self.METRICS, self.relative_accuracy)
+            rolled[key[field]].merge(group)
+        return rolled
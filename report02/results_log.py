@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def combination_key(combo):
+    """Stable id of an experiment: image pair, detector, matcher and a hash of the remaining parameters"""
+    params = {name: combo.get(name) for name in ("detector_params", "cross_check", "verification")}
+    params_json = json.dumps(params, sort_keys=True, default=str)
+    params_hash = hashlib.blake2b(params_json.encode(), digest_size=8).hexdigest()
+    return "|".join([combo["image1_path"], combo["image2_path"], combo["detector_type"],
+                     combo["matcher_type"], params_hash])
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultsLog:
+    """
+    Append-only JSONL log of experiment results, one line per finished combination.
+
+    Each line is flushed as soon as it is written, so an interrupted sweep
+    keeps everything that completed; a partially written last line is
+    ignored when the log is read back.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def read(self):
+        """Yield logged results in order, one record at a time"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and "key" in record:
+                    yield record
+
+    def completed(self, keys=None):
+        """Set of logged keys, optionally restricted to the given keys (results are not kept)"""
+        return {record["key"] for record in self.read() if keys is None or record["key"] in keys}
+
+    def append(self, key, result):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Terminate a line cut off by a previous crash so the next record starts cleanly
+            torn = False
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if torn:
+                self._file.write("\n")
+        self._file.write(json.dumps({"key": key, **result}, default=_to_builtin) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
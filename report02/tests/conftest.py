@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+# The report02 modules import each other as top-level modules from the report02 directory
+# Both reports have a top-level `experiments` module, so run each report's tests in its
+# own session: python -m pytest report02/tests
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def image_files(tmp_path):
+    """Four small random color PNGs"""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"img{i}.png"
+        cv2.imwrite(str(path), rng.integers(0, 256, (48, 64, 3), dtype=np.uint8))
+        paths.append(str(path))
+    return paths
@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+
+from image_cache import ImageCache
+
+
+def test_get_decodes_once_and_evicts_lru(image_files):
+    gray_bytes = 48 * 64
+    cache = ImageCache(max_bytes=2 * gray_bytes)
+    first = cache.gray(image_files[0])
+    assert cache.gray(image_files[0]) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(first, cv2.imread(image_files[0], cv2.IMREAD_GRAYSCALE))
+    assert not first.flags.writeable
+
+    cache.gray(image_files[1])
+    cache.gray(image_files[2])  # evicts image 0
+    cache.gray(image_files[0])
+    assert cache.misses == 4
+    assert cache.gray("missing.png") is None
+    cache.close()
+
+
+def test_publish_shares_grayscale_within_budget(image_files):
+    gray_bytes = 48 * 64
+    owner = ImageCache(max_bytes=3 * gray_bytes)
+    manifest = owner.publish(image_files + image_files[:1], n_threads=2)
+    assert list(manifest) == [(path, "gray") for path in image_files[:3]]
+
+    worker = ImageCache(shared=manifest)
+    for path in image_files[:3]:
+        np.testing.assert_array_equal(worker.gray(path), cv2.imread(path, cv2.IMREAD_GRAYSCALE))
+    assert worker.misses == 0
+    # Color and unpublished images are decoded lazily by the worker
+    np.testing.assert_array_equal(worker.color(image_files[0]), cv2.imread(image_files[0], cv2.IMREAD_COLOR))
+    worker.gray(image_files[3])
+    assert worker.misses == 2
+    worker.close()
+    owner.close()
@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+import pytest
+
+from matching import knn_match_arrays, mutual_filter, ratio_test
+
+
+@pytest.fixture
+def descriptors():
+    rng = np.random.default_rng(4)
+    desc2 = rng.normal(size=(80, 32)).astype(np.float32)
+    # Half the queries are noisy copies of train descriptors, half are unrelated
+    desc1 = np.vstack([desc2[rng.permutation(80)[:30]] + rng.normal(scale=0.1, size=(30, 32)),
+                       rng.normal(size=(30, 32))]).astype(np.float32)
+    return desc1, desc2
+
+
+def test_ratio_test_matches_knn_match_loop(descriptors):
+    desc1, desc2 = descriptors
+    train_idx, distances = knn_match_arrays(desc1, desc2, {"norm": cv2.NORM_L2})
+    query_idx, best_idx, best_dist = ratio_test(train_idx, distances, 0.75)
+
+    expected = [(m.queryIdx, m.trainIdx, m.distance)
+                for m, n in cv2.BFMatcher(cv2.NORM_L2).knnMatch(desc1, desc2, k=2) if m.distance < 0.75 * n.distance]
+    assert list(query_idx) == [q for q, _, _ in expected]
+    assert list(best_idx) == [t for _, t, _ in expected]
+    np.testing.assert_allclose(best_dist, [d for _, _, d in expected], rtol=1e-5)
+    assert len(expected) >= 30
+
+
+def test_ratio_test_ignores_missing_second_neighbour():
+    train_idx = np.array([[0, -1], [1, 2]], dtype=np.int32)
+    distances = np.array([[0.1, np.inf], [0.1, 1.0]], dtype=np.float32)
+    query_idx, best_idx, _ = ratio_test(train_idx, distances)
+    assert list(query_idx) == [1]
+    assert list(best_idx) == [1]
+
+
+def test_mutual_filter_matches_cross_check(descriptors):
+    desc1, desc2 = descriptors
+    config = {"norm": cv2.NORM_L2}
+    train_idx, _ = knn_match_arrays(desc1, desc2, config, k=1)
+    query_idx = np.arange(len(desc1), dtype=np.int32)
+    keep = mutual_filter(query_idx, train_idx[:, 0], desc1, desc2, config)
+
+    cross_checked = {(m.queryIdx, m.trainIdx) for m in cv2.BFMatcher(cv2.NORM_L2, crossCheck=True).match(desc1, desc2)}
+    assert set(zip(query_idx[keep], train_idx[keep, 0])) == cross_checked
+    assert mutual_filter(query_idx[:0], train_idx[:0, 0], desc1, desc2, config).shape == (0,)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from result_stats import QuantileSketch, ResultAggregator, RunningStats
+
+
+def _result(image, detector="SIFT", matcher="BF", status="success", value=1.0):
+    result = {"detector": detector, "matcher": matcher, "status": status}
+    result.update({name: value for name in ResultAggregator.METRICS})
+    if image is not None:
+        result.update({"image1_path": f"pics/{image}_a.jpg", "image2_path": f"pics/{image}_b.jpg"})
+    return result
+
+
+def test_aggregator_skips_results_without_image_paths():
+    aggregator = ResultAggregator()
+    assert aggregator.add(_result("lab"))
+    assert not aggregator.add(_result(None, status="no_features"))
+    assert list(aggregator.groups) == [("SIFT", "BF", "lab")]
+    assert aggregator.groups[("SIFT", "BF", "lab")].runs == 1
+
+
+def _shards(values, sizes):
+    return np.split(values, np.cumsum(sizes)[:-1])
+
+
+def test_running_stats_merge_matches_numpy():
+    values = np.random.default_rng(2).lognormal(0.0, 1.0, 1000)
+    merged = RunningStats()
+    for shard in _shards(values, [0, 1, 300, 699]):
+        stats = RunningStats()
+        for value in shard:
+            stats.add(value)
+        merged.merge(stats)
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert merged.std == pytest.approx(values.std(ddof=1), rel=1e-12)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+def test_quantile_sketch_merge_is_within_relative_accuracy():
+    values = np.concatenate([np.zeros(20), np.random.default_rng(3).lognormal(-3.0, 2.0, 5000)])
+    merged = QuantileSketch(relative_accuracy=0.01)
+    for shard in _shards(values, [2000, 1, 3019]):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in shard:
+            sketch.add(value)
+        merged.merge(sketch)
+    assert merged.count == len(values)
+    for q in (0.0, 0.5, 0.95, 0.99, 1.0):
+        expected = np.quantile(values, q, method="lower")
+        assert merged.quantile(q) == pytest.approx(expected, rel=0.01, abs=1e-12)
+
+
+def test_quantile_sketch_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from results_log import ResultsLog, combination_key
+
+
+def _combo(**overrides):
+    combo = {"image1_path": "a.jpg", "image2_path": "b.jpg", "detector_type": "SIFT", "matcher_type": "BF"}
+    combo.update(overrides)
+    return combo
+
+
+def test_combination_key_depends_on_parameters():
+    assert combination_key(_combo()) == combination_key(_combo(cross_check=None))
+    assert combination_key(_combo()) != combination_key(_combo(cross_check=True))
+    assert combination_key(_combo()) != combination_key(_combo(matcher_type="FLANN"))
+
+
+def test_resume_after_torn_line(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    with ResultsLog(path) as log:
+        log.append("k1", {"good_matches": np.int64(3), "match_quality": np.float32(0.5)})
+        log.append("k2", {"good_matches": 4})
+    # A crash mid-write leaves a partial last line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "k3", "good_ma')
+
+    log = ResultsLog(path)
+    assert log.completed() == {"k1", "k2"}
+    assert log.completed({"k2", "k3"}) == {"k2"}
+    with log:
+        log.append("k3", {"good_matches": 5})
+    records = list(ResultsLog(path).read())
+    assert [record["key"] for record in records] == ["k1", "k2", "k3"]
+    assert records[0]["good_matches"] == 3
+    assert ResultsLog(str(tmp_path / "missing.jsonl")).completed() == set()
@@ -0,0 +1,128 @@
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+import profiling
+from feature_store import arrays_to_keypoints
+from matching import to_dmatches
+
+
+class VisualizationPolicy:
+    """
+    Decide which experiments get visual artifacts (keypoints, matches, registration).
+
+    mode: "all", "none", "sample" (only the pairs in sample_names) or "failures" (status != "success")
+    """
+
+    MODES = ("all", "none", "sample", "failures")
+
+    def __init__(self, mode="all", sample_names=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown visualization mode: {mode}")
+        self.mode = mode
+        self.sample_names = frozenset(sample_names or ())
+
+    @classmethod
+    def sample(cls, base_names, n, seed=0):
+        """Render artifacts for n randomly chosen (but reproducible) image pairs"""
+        base_names = sorted(base_names)
+        return cls("sample", random.Random(seed).sample(base_names, min(n, len(base_names))))
+
+    def should_render(self, base_name, status):
+        if self.mode == "all":
+            return True
+        if self.mode == "sample":
+            return base_name in self.sample_names
+        if self.mode == "failures":
+            return status != "success"
+        return False
+
+
+class ArtifactWriter:
+    """
+    Render and encode artifacts on a background thread pool (OpenCV drawing and PNG encoding release the GIL).
+
+    At most max_pending jobs are queued so that pending images do not pile up in memory.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, png_compression=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifacts")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression] if png_compression is not None else []
+        self._keypoint_images = set()
+        self._lock = threading.Lock()
+        self.errors = []
+
+    def submit(self, fn, *args):
+        self.slots.acquire()
+        future = self.executor.submit(self._run, fn, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        try:
+            fn(self, *args)
+        except Exception as e:
+            self.errors.append(e)
+            print(f"Failed to write artifact: {e}")
+
+    def claim_keypoint_image(self, path):
+        """Keypoint images do not depend on the matcher; only the first job writes them"""
+        with self._lock:
+            if path in self._keypoint_images:
+                return False
+            self._keypoint_images.add(path)
+            return True
+
+    def imwrite(self, path, img):
+        with profiling.span("imwrite", path=os.path.basename(path)):
+            cv2.imwrite(path, img, self.params)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def render_artifacts(writer, output_dir, base_name, detector_type, matcher_type, image1_path, image2_path,
+                     features1, features2, query_idx, train_idx, match_dist, H, load_color=None):
+    """
+    Draw keypoints, matches and (if H is given) the registration result and write them as PNGs
+
+    load_color: callable(path) -> BGR image (default: cv2.imread)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    load_color = load_color or cv2.imread
+    with profiling.span("imread"):
+        img1_color = load_color(image1_path)
+        img2_color = load_color(image2_path)
+    kp1, kp2 = arrays_to_keypoints(features1), arrays_to_keypoints(features2)
+
+    # Keypoints
+    kp1_path = f"{output_dir}/{base_name}_{detector_type}_kp1.png"
+    if writer.claim_keypoint_image(kp1_path):
+        with profiling.span("draw_keypoints"):
+            img_kp1 = cv2.drawKeypoints(img1_color, kp1, None, color=(0, 255, 0))
+            img_kp2 = cv2.drawKeypoints(img2_color, kp2, None, color=(0, 255, 0))
+        writer.imwrite(kp1_path, img_kp1)
+        writer.imwrite(f"{output_dir}/{base_name}_{detector_type}_kp2.png", img_kp2)
+
+    # Matches
+    with profiling.span("draw_matches"):
+        good_matches = to_dmatches(query_idx, train_idx, match_dist)
+        img_matches = cv2.drawMatches(img1_color, kp1, img2_color, kp2, good_matches, None,
+                                      flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS)
+    writer.imwrite(f"{output_dir}/{base_name}_{detector_type}_{matcher_type}_matches.png", img_matches)
+
+    # Registration
+    if H is not None:
+        with profiling.span("draw_registration"):
+            img1_warped = cv2.warpPerspective(img1_color, H, (img2_color.shape[1], img2_color.shape[0]))
+            gray_warped = cv2.cvtColor(img1_warped, cv2.COLOR_BGR2GRAY)
+            ret, mask_warped = cv2.threshold(gray_warped, 1, 255, cv2.THRESH_BINARY)
+            mask_warped_inv = cv2.bitwise_not(mask_warped)
+            img2_masked = cv2.bitwise_and(img2_color, img2_color, mask=mask_warped_inv)
+            img_registered = cv2.add(img2_masked, img1_warped)
+        writer.imwrite(f"{output_dir}/{base_name}_{detector_type}_{matcher_type}_registration.png",
+                       img_registered)